@@ -0,0 +1,187 @@
+# benchmark.py
+"""
+Durchsatz-Benchmark für den Versandpfad gegen den lokalen Fake-SMTP-Server.
+
+Misst send_email (eine Verbindung je Nachricht) und EmailSenderThread (Versand-Engine der GUI)
+bei 1.000, 10.000 und 100.000 Empfängern und gibt Nachrichten pro Sekunde sowie die
+p50/p99-Latenz je Nachricht aus:
+
+    python benchmark.py
+    python benchmark.py --sizes 1000 10000 --latency 0.002 --engine asyncio --connections 20
+    python benchmark.py --targets thread --sizes 10000 --metrics
+
+Die Latenz reicht vom Rendern der Nachricht bis zum Versandergebnis. Bei mehreren Empfängern
+pro Transaktion ist sie keinem einzelnen Empfänger zuzuordnen und wird nicht ausgewiesen.
+"""
+import argparse
+import threading
+import time
+
+from email_manager import (send_email, MessageTemplate, DEFAULT_CONNECTIONS, DEFAULT_MAX_MESSAGES_PER_CONNECTION,
+                           DEFAULT_RECIPIENTS_PER_TRANSACTION, ENGINE_THREADS, ENGINE_ASYNCIO)
+from fake_smtp_server import FakeSMTPServer
+from metrics import MetricsRegistry
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+TARGETS = ['send_email', 'thread']
+
+SENDER_EMAIL = 'benchmark@example.com'
+SENDER_PASSWORD = 'benchmark'
+SUBJECT = 'Benchmark'
+BODY = '<p>Hallo,</p><p>dies ist eine Testnachricht für den Benchmark.</p>'
+
+
+class LatencyRecorder:
+    """
+    Zeitpunkte je Empfänger: Rendern der Nachricht bis zum Versandergebnis.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = {}
+        self.latencies = []
+
+    def start(self, recipient):
+        with self._lock:
+            self._started[recipient] = time.perf_counter()
+
+    def finish(self, recipient):
+        with self._lock:
+            started = self._started.pop(recipient, None)
+            if started is not None:
+                self.latencies.append(time.perf_counter() - started)
+
+
+class TimedMessageTemplate(MessageTemplate):
+    def __init__(self, sender_email, subject, body, recorder):
+        super().__init__(sender_email, subject, body)
+        self.recorder = recorder
+
+    def render(self, recipient_email):
+        self.recorder.start(recipient_email)
+        return super().render(recipient_email)
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_recipients(count):
+    return [f'empfaenger{i}@example.com' for i in range(count)]
+
+
+def bench_send_email(host, transport, recipients, args):
+    metrics = MetricsRegistry()
+    latencies = []
+    success_count = 0
+    for recipient in recipients:
+        started = time.perf_counter()
+        if send_email(host, SENDER_EMAIL, SENDER_PASSWORD, recipient, SUBJECT, BODY, transport=transport,
+                      metrics=metrics):
+            success_count += 1
+        latencies.append(time.perf_counter() - started)
+    return success_count, len(recipients) - success_count, latencies, metrics
+
+
+def bench_thread(host, transport, recipients, args):
+    from gui import EmailSenderThread
+
+    recorder = LatencyRecorder()
+
+    class BenchmarkSenderThread(EmailSenderThread):
+        def dump_metrics(self):
+            # Metriken werden vom Benchmark ausgegeben
+            pass
+
+        def create_template(self):
+            return TimedMessageTemplate(self.sender_email, self.subject, self.body, recorder)
+
+        def on_result(self, email, success, error):
+            recorder.finish(email)
+            super().on_result(email, success, error)
+
+    results = {}
+    thread = BenchmarkSenderThread(
+        host, SENDER_EMAIL, SENDER_PASSWORD, recipients, SUBJECT, BODY,
+        max_messages_per_connection=args.max_messages_per_connection,
+        transport=transport,
+        connections=args.connections,
+        engine=args.engine,
+        recipients_per_transaction=args.recipients_per_transaction
+    )
+    thread.finished.connect(lambda success_count, failure_count: results.update(
+        success=success_count, failure=failure_count))
+    thread.error.connect(lambda message: print(f"Fehler: {message}"))
+    # Direkt im aktuellen Thread ausführen, damit die Zeitmessung ohne Qt-Event-Loop auskommt
+    thread.run()
+    return results.get('success', 0), results.get('failure', len(recipients)), recorder.latencies, thread.metrics
+
+
+BENCHMARKS = {
+    'send_email': bench_send_email,
+    'thread': bench_thread,
+}
+
+
+def format_ms(seconds):
+    return 'n/a' if seconds is None else f'{seconds * 1000:.2f} ms'
+
+
+def run_benchmark(target, size, args):
+    server = FakeSMTPServer(
+        latency=args.latency,
+        temp_failure_rate=args.temp_failure_rate,
+        perm_failure_rate=args.perm_failure_rate,
+        drop_rate=args.drop_rate,
+        pipelining=not args.no_pipelining,
+        seed=size
+    )
+    host, port = server.start()
+    transport = {'port': port, 'mode': 'plain'}
+    recipients = make_recipients(size)
+    try:
+        started = time.perf_counter()
+        success_count, failure_count, latencies, metrics = BENCHMARKS[target](host, transport, recipients, args)
+        elapsed = time.perf_counter() - started
+    finally:
+        server.stop()
+    print(f"{target:<12} {size:>8} {size / elapsed:>12.1f} {format_ms(percentile(latencies, 0.5)):>12} "
+          f"{format_ms(percentile(latencies, 0.99)):>12} {success_count:>8} {failure_count:>8} "
+          f"{server.stats['connections']:>10}")
+    if args.metrics:
+        print(metrics.summary())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Durchsatz-Benchmark für den Versandpfad.")
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=TARGETS)
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--engine', choices=[ENGINE_THREADS, ENGINE_ASYNCIO], default=ENGINE_THREADS)
+    parser.add_argument('--connections', type=int, default=DEFAULT_CONNECTIONS)
+    parser.add_argument('--max-messages-per-connection', type=int, default=DEFAULT_MAX_MESSAGES_PER_CONNECTION)
+    parser.add_argument('--recipients-per-transaction', type=int, default=DEFAULT_RECIPIENTS_PER_TRANSACTION)
+    parser.add_argument('--latency', type=float, default=0.0, help="Verzögerung des Servers je Antwort in Sekunden")
+    parser.add_argument('--temp-failure-rate', type=float, default=0.0)
+    parser.add_argument('--perm-failure-rate', type=float, default=0.0)
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    parser.add_argument('--no-pipelining', action='store_true')
+    parser.add_argument('--metrics', action='store_true', help="Dauer je SMTP-Phase und Antwortcodes ausgeben")
+    args = parser.parse_args()
+
+    print(f"{'Ziel':<12} {'Empfänger':>8} {'Nachr./s':>12} {'p50':>12} {'p99':>12} {'OK':>8} {'Fehler':>8} "
+          f"{'Verbind.':>10}")
+    for target in args.targets:
+        for size in args.sizes:
+            try:
+                run_benchmark(target, size, args)
+            except ImportError as e:
+                print(f"{target}: übersprungen ({e})")
+                break
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,490 @@
 # database.py
 import sqlite3
+import threading
+import atexit
+from contextlib import contextmanager
+
+DB_FILE = 'marketing_tool.db'
+
+# Verbindungseinstellungen: WAL erlaubt Lesen während des Schreibens, synchronous=NORMAL
+# spart im WAL-Modus das fsync je Commit (nur beim Checkpoint wird synchronisiert)
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -16384',       # 16 MiB Seiten-Cache
+    'PRAGMA mmap_size = 268435456',     # 256 MiB Memory-Mapped I/O
+    'PRAGMA temp_store = MEMORY',
+)
+
+# Höchstzahl an Platzhaltern je IN (...)-Klausel (ältere SQLite-Versionen erlauben 999)
+SQLITE_MAX_IN_PARAMETERS = 500
+
+# Anzahl vorbereiteter Anweisungen, die die Verbindung wiederverwendet
+SQLITE_CACHED_STATEMENTS = 256
+
+# So viele Empfänger liest der Versand je Abfrage aus der Outbox
+RECIPIENT_CHUNK_SIZE = 5000
+
+_connection = None
+_lock = threading.RLock()
+
+def get_connection():
+    """
+    Gibt die gemeinsame Verbindung zurück und öffnet sie beim ersten Aufruf.
+
+    Die Verbindung wird von GUI- und Versand-Threads geteilt; Zugriffe nur über _transaction().
+    """
+    global _connection
+    with _lock:
+        if _connection is None:
+            conn = sqlite3.connect(DB_FILE, check_same_thread=False,
+                                   cached_statements=SQLITE_CACHED_STATEMENTS)
+            for pragma in SQLITE_PRAGMAS:
+                conn.execute(pragma)
+            # Dieselbe Normalisierung in SQL (Migrationen) wie in Python; lower() von SQLite kennt nur ASCII
+            conn.create_function('normalize_email', 1, normalize_email, deterministic=True)
+            conn.create_function('email_domain', 1, email_domain, deterministic=True)
+            _connection = conn
+        return _connection
+
+@contextmanager
+def _transaction():
+    """
+    Exklusiver Zugriff auf die gemeinsame Verbindung; Commit am Ende, Rollback bei einem Fehler.
+    """
+    with _lock:
+        conn = get_connection()
+        with conn:
+            yield conn.cursor()
+
+def close_db():
+    global _connection
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+
+# Beim Beenden schließen, damit das WAL in die Datenbank übernommen wird
+atexit.register(close_db)
 
 def init_db():
-    conn = sqlite3.connect('marketing_tool.db')
-    cursor = conn.cursor()
+    with _transaction() as cursor:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS emails (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT UNIQUE NOT NULL
+            )
+        ''')
+    init_outbox()
+    migrate_db()
+
+def _add_email_domain(cursor):
+    # Domain als eigene Spalte, damit nach ihr über einen Index gefiltert werden kann
+    cursor.execute('ALTER TABLE emails ADD COLUMN domain TEXT')
+    cursor.execute("UPDATE emails SET domain = lower(substr(email, instr(email, '@') + 1))")
+    # Präfixsuche ohne Groß-/Kleinschreibung, allein und innerhalb einer Domain
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_email_nocase ON emails (email COLLATE NOCASE)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_domain ON emails (domain, email COLLATE NOCASE)')
+
+def _add_segments_and_status(cursor):
+    # Versandstatus je Adresse: nur 'active' wird bei neuen Kampagnen berücksichtigt
+    cursor.execute("ALTER TABLE emails ADD COLUMN status TEXT NOT NULL DEFAULT 'active'")
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_status ON emails (status)')
+    # Segmente (Tags) und Zuordnung zu Adressen
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS emails (
+        CREATE TABLE IF NOT EXISTS segments (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL
+            name TEXT UNIQUE NOT NULL
         )
     ''')
-    conn.commit()
-    conn.close()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_segments (
+            segment_id INTEGER NOT NULL REFERENCES segments(id),
+            email_id INTEGER NOT NULL REFERENCES emails(id),
+            PRIMARY KEY (segment_id, email_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_segments_email ON email_segments (email_id)')
+
+def _merge_duplicate_emails(cursor):
+    # Duplikate nach email_norm in SQL zusammenführen: die älteste Zeile bleibt, ein abweichender Status
+    # (abgemeldet vor unzustellbar vor aktiv) und alle Segmente werden übernommen
+    cursor.execute('''
+        CREATE TEMP TABLE email_keep (
+            email_norm TEXT PRIMARY KEY,
+            keep_id INTEGER NOT NULL,
+            status TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO email_keep (email_norm, keep_id, status)
+        SELECT email_norm, MIN(id),
+               CASE MAX(CASE status WHEN 'unsubscribed' THEN 2 WHEN 'bounced' THEN 1 ELSE 0 END)
+                   WHEN 2 THEN 'unsubscribed' WHEN 1 THEN 'bounced' ELSE 'active' END
+        FROM emails
+        GROUP BY email_norm
+        HAVING COUNT(*) > 1
+    ''')
+    cursor.execute('CREATE TEMP TABLE email_duplicates (id INTEGER PRIMARY KEY, keep_id INTEGER NOT NULL)')
+    cursor.execute('''
+        INSERT INTO email_duplicates (id, keep_id)
+        SELECT e.id, k.keep_id FROM emails e JOIN email_keep k ON k.email_norm = e.email_norm
+        WHERE e.id <> k.keep_id
+    ''')
+    cursor.execute('''
+        UPDATE emails SET status = (SELECT k.status FROM email_keep k WHERE k.email_norm = emails.email_norm)
+        WHERE id IN (SELECT keep_id FROM email_keep)
+    ''')
+    cursor.execute('''
+        INSERT OR IGNORE INTO email_segments (segment_id, email_id)
+        SELECT s.segment_id, d.keep_id FROM email_duplicates d JOIN email_segments s ON s.email_id = d.id
+    ''')
+    cursor.execute('DELETE FROM email_segments WHERE email_id IN (SELECT id FROM email_duplicates)')
+    cursor.execute('DELETE FROM emails WHERE id IN (SELECT id FROM email_duplicates)')
+    cursor.execute('DROP TABLE email_duplicates')
+    cursor.execute('DROP TABLE email_keep')
+
+def _add_normalized_email(cursor):
+    # Normalisierte Adresse (ohne Leerzeichen, klein geschrieben) als eindeutiger Schlüssel
+    cursor.execute('ALTER TABLE emails ADD COLUMN email_norm TEXT')
+    cursor.execute('UPDATE emails SET email_norm = normalize_email(email)')
+    _merge_duplicate_emails(cursor)
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_emails_email_norm ON emails (email_norm)')
+
+def _renormalize_emails(cursor):
+    # Frühere Fassungen füllten email_norm und domain mit lower() von SQLite, das nur ASCII-Zeichen
+    # umwandelt (MÜLLER@x.de und müller@x.de blieben getrennt); mit der Python-Normalisierung neu berechnen
+    cursor.execute('UPDATE emails SET domain = email_domain(email) WHERE domain IS NOT email_domain(email)')
+    cursor.execute('SELECT COUNT(*) FROM emails WHERE email_norm IS NOT normalize_email(email)')
+    if not cursor.fetchone()[0]:
+        return
+    cursor.execute('DROP INDEX IF EXISTS idx_emails_email_norm')
+    cursor.execute('UPDATE emails SET email_norm = normalize_email(email) WHERE email_norm IS NOT normalize_email(email)')
+    _merge_duplicate_emails(cursor)
+    cursor.execute('CREATE UNIQUE INDEX idx_emails_email_norm ON emails (email_norm)')
+
+# Schema-Migrationen; die Position in der Liste ist die Version in PRAGMA user_version
+MIGRATIONS = [
+    _add_email_domain,
+    _add_segments_and_status,
+    _add_normalized_email,
+    _renormalize_emails,
+]
+
+# Status einer Adresse
+EMAIL_STATUS_ACTIVE = 'active'
+EMAIL_STATUS_BOUNCED = 'bounced'
+EMAIL_STATUS_UNSUBSCRIBED = 'unsubscribed'
+EMAIL_STATUSES = (EMAIL_STATUS_ACTIVE, EMAIL_STATUS_BOUNCED, EMAIL_STATUS_UNSUBSCRIBED)
+
+def migrate_db():
+    """
+    Führt alle noch nicht angewendeten Migrationen aus, jede in einer eigenen Transaktion.
+    """
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        with _transaction() as cursor:
+            cursor.execute('PRAGMA user_version')
+            if cursor.fetchone()[0] >= version:
+                continue
+            cursor.execute('BEGIN')
+            migration(cursor)
+            cursor.execute(f'PRAGMA user_version = {version}')
+
+def email_domain(email):
+    return email.partition('@')[2].lower()
+
+def normalize_email(email):
+    # Schlüssel für die Eindeutigkeit: Foo@Example.com und foo@example.com sind dieselbe Adresse
+    return email.strip().lower()
 
 def add_email(email):
-    conn = sqlite3.connect('marketing_tool.db')
-    cursor = conn.cursor()
-    try:
-        cursor.execute('INSERT INTO emails (email) VALUES (?)', (email,))
-        conn.commit()
-    except sqlite3.IntegrityError:
-        pass  # E-Mail bereits vorhanden
-    conn.close()
+    """
+    Fügt eine E-Mail-Adresse hinzu und gibt ihre ID zurück; ist sie (auch in anderer Schreibweise)
+    bereits vorhanden, None.
+    """
+    email = email.strip()
+    with _transaction() as cursor:
+        cursor.execute(
+            'INSERT OR IGNORE INTO emails (email, email_norm, domain) VALUES (?, ?, ?)',
+            (email, normalize_email(email), email_domain(email))
+        )
+        if cursor.rowcount == 0:
+            return None
+        return cursor.lastrowid
+
+def add_emails(emails):
+    """
+    Fügt mehrere E-Mail-Adressen in einer Transaktion ein; vorhandene werden ignoriert,
+    auch wenn sie sich nur in Groß-/Kleinschreibung unterscheiden.
+
+    Gibt die Anzahl der neu eingefügten Adressen zurück.
+    """
+    with _transaction() as cursor:
+        cursor.executemany(
+            'INSERT OR IGNORE INTO emails (email, email_norm, domain) VALUES (?, ?, ?)',
+            ((email.strip(), normalize_email(email), email_domain(email)) for email in emails)
+        )
+        return cursor.rowcount
 
 def get_emails():
-    conn = sqlite3.connect('marketing_tool.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT email FROM emails')
-    emails = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return emails
+    with _transaction() as cursor:
+        cursor.execute('SELECT email FROM emails')
+        return [row[0] for row in cursor.fetchall()]
+
+def get_emails_page(after_id=0, limit=500):
+    """
+    Gibt bis zu limit Adressen als (id, email) mit einer ID größer als after_id zurück (Keyset-Paginierung).
+    """
+    with _transaction() as cursor:
+        cursor.execute('SELECT id, email FROM emails WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit))
+        return cursor.fetchall()
+
+def _email_filter(prefix, domain, after=None):
+    # WHERE-Klausel für Präfix- und Domainsuche; jede Bedingung ist über einen Index abgedeckt
+    clauses = []
+    params = []
+    if domain:
+        clauses.append('domain = ?')
+        params.append(domain.lower())
+    if prefix or after:
+        # Untere Grenze des Indexbereichs: Suchbegriff oder zuletzt geladene Adresse
+        clauses.append('email >= ? COLLATE NOCASE')
+        params.append(after[1] if after else prefix)
+    if prefix:
+        clauses.append('email < ? COLLATE NOCASE')
+        params.append(prefix + '\U0010ffff')
+    if after:
+        clauses.append('(email > ? COLLATE NOCASE OR id > ?)')
+        params.extend((after[1], after[0]))
+    where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+    return where, params
+
+def search_emails_page(prefix='', domain='', after=None, limit=500):
+    """
+    Sucht Adressen, die mit prefix beginnen (ohne Groß-/Kleinschreibung) und/oder zu domain gehören.
+
+    Ergebnis als (id, email), sortiert nach Adresse; after ist die letzte Zeile der vorherigen Seite.
+    """
+    where, params = _email_filter(prefix, domain, after)
+    with _transaction() as cursor:
+        cursor.execute(
+            f'SELECT id, email FROM emails{where} ORDER BY email COLLATE NOCASE, id LIMIT ?',
+            params + [limit]
+        )
+        return cursor.fetchall()
+
+def count_emails(prefix='', domain=''):
+    where, params = _email_filter(prefix, domain)
+    with _transaction() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM emails{where}', params)
+        return cursor.fetchone()[0]
 
 def delete_email(email):
-    conn = sqlite3.connect('marketing_tool.db')
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM emails WHERE email = ?', (email,))
-    conn.commit()
-    conn.close()
+    with _transaction() as cursor:
+        cursor.execute('DELETE FROM emails WHERE email = ?', (email,))
+
+def delete_emails(emails):
+    """
+    Löscht mehrere E-Mail-Adressen in einer Transaktion und gibt die gelöschten Zeilen als (id, email) zurück.
+    """
+    emails = [normalize_email(email) for email in emails]
+    deleted = []
+    with _transaction() as cursor:
+        for start in range(0, len(emails), SQLITE_MAX_IN_PARAMETERS):
+            chunk = emails[start:start + SQLITE_MAX_IN_PARAMETERS]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'SELECT id, email FROM emails WHERE email_norm IN ({placeholders})', chunk)
+            rows = cursor.fetchall()
+            if rows:
+                ids = [row[0] for row in rows]
+                id_placeholders = ','.join('?' * len(ids))
+                cursor.execute(f'DELETE FROM email_segments WHERE email_id IN ({id_placeholders})', ids)
+                cursor.execute(f'DELETE FROM emails WHERE id IN ({id_placeholders})', ids)
+                deleted.extend(rows)
+    return deleted
+
+def _execute_chunked(cursor, sql, values, extra_params=()):
+    # Führt sql mit IN ({placeholders}) für jeweils bis zu SQLITE_MAX_IN_PARAMETERS Werte aus
+    values = list(values)
+    changed = 0
+    for start in range(0, len(values), SQLITE_MAX_IN_PARAMETERS):
+        chunk = values[start:start + SQLITE_MAX_IN_PARAMETERS]
+        cursor.execute(sql.format(placeholders=','.join('?' * len(chunk))), list(extra_params) + chunk)
+        changed += cursor.rowcount
+    return changed
+
+def set_email_status(emails, status):
+    """
+    Setzt den Status (active, bounced, unsubscribed) mehrerer Adressen und gibt die Anzahl geänderter zurück.
+    """
+    if status not in EMAIL_STATUSES:
+        raise ValueError(f"Unbekannter Status: {status}")
+    with _transaction() as cursor:
+        return _execute_chunked(
+            cursor, 'UPDATE emails SET status = ? WHERE email_norm IN ({placeholders})',
+            map(normalize_email, emails), (status,)
+        )
+
+def get_segments():
+    """
+    Gibt alle Segmente als (id, name) zurück, sortiert nach Name.
+    """
+    with _transaction() as cursor:
+        cursor.execute('SELECT id, name FROM segments ORDER BY name')
+        return cursor.fetchall()
+
+def create_segment(name):
+    """
+    Legt ein Segment an (falls es noch nicht existiert) und gibt seine ID zurück.
+    """
+    with _transaction() as cursor:
+        cursor.execute('INSERT OR IGNORE INTO segments (name) VALUES (?)', (name,))
+        cursor.execute('SELECT id FROM segments WHERE name = ?', (name,))
+        return cursor.fetchone()[0]
+
+def add_emails_to_segment(segment_id, emails):
+    """
+    Ordnet Adressen einem Segment zu und gibt die Anzahl neuer Zuordnungen zurück.
+    """
+    with _transaction() as cursor:
+        return _execute_chunked(
+            cursor,
+            'INSERT OR IGNORE INTO email_segments (segment_id, email_id) '
+            'SELECT ?, id FROM emails WHERE email_norm IN ({placeholders})',
+            map(normalize_email, emails), (segment_id,)
+        )
+
+def _recipients_query(columns, segment_id):
+    # Aktive Adressen, optional nur eines Segments. CROSS JOIN legt die Reihenfolge fest:
+    # zuerst die Zuordnungen des Segments über den Primärschlüssel, dann die Adressen per ID
+    if segment_id is None:
+        return f"SELECT {columns} FROM emails e WHERE e.status = 'active'", []
+    return (
+        f"SELECT {columns} FROM email_segments s CROSS JOIN emails e "
+        f"WHERE s.segment_id = ? AND e.id = s.email_id AND e.status = 'active'",
+        [segment_id]
+    )
+
+def count_recipients(segment_id=None):
+    """
+    Anzahl der aktiven Adressen, die eine Kampagne für das Segment (None = alle) erreichen würde.
+    """
+    sql, params = _recipients_query('COUNT(*)', segment_id)
+    with _transaction() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()[0]
+
+def init_outbox():
+    with _transaction() as cursor:
+        # Kampagnen mit der gerenderten Nachricht
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS campaigns (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                sender_email TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running'
+            )
+        ''')
+        # Versandstatus je Empfänger: pending, sent oder failed
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                campaign_id INTEGER NOT NULL REFERENCES campaigns(id),
+                email TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                error TEXT,
+                updated_at TEXT,
+                UNIQUE (campaign_id, email)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_outbox_campaign_status ON outbox (campaign_id, status)')
+
+def create_campaign(sender_email, subject, body, segment_id=None):
+    """
+    Legt eine Kampagne an und übernimmt alle aktiven Adressen des Segments (None = alle)
+    mit einer INSERT ... SELECT-Abfrage im Status 'pending' in die Outbox. Gibt die ID zurück.
+    """
+    with _transaction() as cursor:
+        cursor.execute(
+            'INSERT INTO campaigns (sender_email, subject, body) VALUES (?, ?, ?)',
+            (sender_email, subject, body)
+        )
+        campaign_id = cursor.lastrowid
+        sql, params = _recipients_query('?, e.email', segment_id)
+        cursor.execute(f'INSERT OR IGNORE INTO outbox (campaign_id, email) {sql}', [campaign_id] + params)
+    return campaign_id
+
+def iter_pending_recipients(campaign_id, chunk_size=RECIPIENT_CHUNK_SIZE):
+    """
+    Liefert die offenen Empfänger einer Kampagne blockweise, ohne die ganze Liste zu laden.
+
+    Jeder Block ist eine eigene kurze Abfrage ab der letzten Outbox-ID (Keyset über den Index
+    campaign_id, status, id). So bleibt während des Versands keine Lesetransaktion offen, die den
+    WAL-Checkpoint aufhält, und die gemeinsame Verbindung ist nur für die Dauer eines Blocks gesperrt.
+    """
+    last_id = 0
+    while True:
+        with _transaction() as cursor:
+            cursor.execute(
+                "SELECT id, email FROM outbox WHERE campaign_id = ? AND status = 'pending' AND id > ? "
+                "ORDER BY id LIMIT ?",
+                (campaign_id, last_id, chunk_size)
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        for row in rows:
+            yield row[1]
+        if len(rows) < chunk_size:
+            return
+
+def count_pending_recipients(campaign_id):
+    with _transaction() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM outbox WHERE campaign_id = ? AND status = 'pending'",
+            (campaign_id,)
+        )
+        return cursor.fetchone()[0]
+
+def update_outbox_status(campaign_id, results):
+    """
+    Schreibt mehrere Versandergebnisse (email, status, error) in einer Transaktion.
+    """
+    with _transaction() as cursor:
+        cursor.executemany(
+            "UPDATE outbox SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP "
+            "WHERE campaign_id = ? AND email = ?",
+            ((status, error, campaign_id, email) for email, status, error in results)
+        )
+
+def set_campaign_status(campaign_id, status):
+    with _transaction() as cursor:
+        cursor.execute('UPDATE campaigns SET status = ? WHERE id = ?', (status, campaign_id))
+
+def get_unfinished_campaign():
+    """
+    Gibt die letzte nicht abgeschlossene Kampagne mit offenen Empfängern zurück oder None.
+    """
+    with _transaction() as cursor:
+        cursor.execute('''
+            SELECT c.id, c.sender_email, c.subject, c.body, COUNT(o.id)
+            FROM campaigns c
+            JOIN outbox o ON o.campaign_id = c.id AND o.status = 'pending'
+            WHERE c.status = 'running'
+            GROUP BY c.id
+            ORDER BY c.id DESC
+            LIMIT 1
+        ''')
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return {
+        'id': row[0],
+        'sender_email': row[1],
+        'subject': row[2],
+        'body': row[3],
+        'pending': row[4]
+    }
@@ -1,13 +1,304 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.header import Header
+from email import policy
 import ssl
 import re
+import json
+import os
+import threading
+import time
+import queue
+import asyncio
+import base64
+import functools
+import socket
+from collections import namedtuple
 
-def send_email(smtp_server, sender_email, sender_password, recipient_email, subject, body):
+from metrics import default_registry
+
+# Nach so vielen Nachrichten wird die Verbindung neu aufgebaut
+DEFAULT_MAX_MESSAGES_PER_CONNECTION = 100
+
+# Anzahl paralleler SMTP-Verbindungen beim Massenversand
+DEFAULT_CONNECTIONS = 4
+
+# Standardmäßig eine Transaktion je Empfänger (persönlicher To-Header)
+DEFAULT_RECIPIENTS_PER_TRANSACTION = 1
+
+# To-Header bei Transaktionen mit mehreren Empfängern
+UNDISCLOSED_RECIPIENTS = b'undisclosed-recipients:;'
+
+# So oft wird eine wegen Drosselung (421/451/4.7.x) abgelehnte Nachricht erneut versucht
+MAX_THROTTLE_RETRIES = 5
+
+# Versand-Engines für EmailSenderThread
+ENGINE_THREADS = "threads"
+ENGINE_ASYNCIO = "asyncio"
+
+# Define SMTP ports and methods
+SMTP_OPTIONS = [
+    {'port': 465, 'mode': 'ssl'},       # SSL
+    {'port': 587, 'mode': 'starttls'},  # TLS
+    {'port': 25, 'mode': 'plain'},      # Plain
+]
+
+# Standard-Port je Verbindungsart
+DEFAULT_PORTS = {option['mode']: option['port'] for option in SMTP_OPTIONS}
+
+# Nur verschlüsselte Verbindungsarten werden parallel getestet; unverschlüsselt (Port 25) wird erst
+# versucht, wenn alle fehlgeschlagen sind, und nie automatisch zwischengespeichert
+TLS_SMTP_OPTIONS = [option for option in SMTP_OPTIONS if option['mode'] != 'plain']
+PLAIN_SMTP_OPTIONS = [option for option in SMTP_OPTIONS if option['mode'] == 'plain']
+
+# Zuletzt funktionierende Verbindungsart je Server (liegt neben smtp_config.json)
+TRANSPORT_CACHE_FILE = "smtp_transport_cache.json"
+_transport_cache_lock = threading.Lock()
+
+# Verzögerung, mit der die nächste Verbindungsart beim parallelen Testen gestartet wird
+PROBE_STAGGER_SECONDS = 0.25
+
+# Namen der Versandmetriken (siehe metrics.py)
+METRIC_PHASE_SECONDS = "smtp_phase_seconds"
+METRIC_PHASE_ERRORS = "smtp_phase_errors_total"
+METRIC_REPLIES = "smtp_replies_total"
+METRIC_MESSAGES = "smtp_messages_total"
+
+# Ergebnis von probe_transports: gewonnene Verbindungsart, offene Verbindung und Dauer je Versuch
+ProbeResult = namedtuple('ProbeResult', ['option', 'server', 'timings'])
+
+
+class SMTPConnectionFailed(smtplib.SMTPException):
+    """
+    Wird ausgelöst, wenn keine der SMTP-Verbindungsoptionen funktioniert.
+    """
+
+
+def _read_transport_cache(cache_file):
+    if not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_cached_transport(smtp_server, cache_file=TRANSPORT_CACHE_FILE):
+    """
+    Gibt die zuletzt funktionierende Verbindungsart für den Server zurück oder None.
+    """
+    with _transport_cache_lock:
+        entry = _read_transport_cache(cache_file).get(smtp_server)
+    if not entry or entry.get('mode') not in DEFAULT_PORTS:
+        return None
+    return {'port': int(entry['port']), 'mode': entry['mode']}
+
+
+def save_cached_transport(smtp_server, option, cache_file=TRANSPORT_CACHE_FILE):
+    with _transport_cache_lock:
+        cache = _read_transport_cache(cache_file)
+        if cache.get(smtp_server) == option:
+            return
+        cache[smtp_server] = {'port': option['port'], 'mode': option['mode']}
+        try:
+            with open(cache_file, 'w') as file:
+                json.dump(cache, file)
+        except OSError as e:
+            print(f"Fehler beim Speichern des SMTP-Verbindungscaches: {e}")
+
+
+def forget_cached_transport(smtp_server, cache_file=TRANSPORT_CACHE_FILE):
+    with _transport_cache_lock:
+        cache = _read_transport_cache(cache_file)
+        if cache.pop(smtp_server, None) is None:
+            return
+        try:
+            with open(cache_file, 'w') as file:
+                json.dump(cache, file)
+        except OSError as e:
+            print(f"Fehler beim Speichern des SMTP-Verbindungscaches: {e}")
+
+
+def _phase(metrics, phase):
+    # Dauer einer SMTP-Phase messen, Fehler werden je Phase gezählt
+    return metrics.timer(METRIC_PHASE_SECONDS, {'phase': phase}, error_counter=METRIC_PHASE_ERRORS)
+
+
+def _observe_connect(metrics, started, tls_seconds):
+    # Verbindungsaufbau, Begrüßung und EHLO ohne die Dauer des TLS-Handshakes
+    metrics.observe(METRIC_PHASE_SECONDS, time.perf_counter() - started - tls_seconds, {'phase': 'connect'})
+    if tls_seconds:
+        metrics.observe(METRIC_PHASE_SECONDS, tls_seconds, {'phase': 'tls'})
+
+
+class _MeteredSMTP(smtplib.SMTP):
+    # smtplib.SMTP, das jede Antwort des Servers nach Statuscode zählt
+
+    def __init__(self, *args, metrics=None, **kwargs):
+        self.metrics = metrics or default_registry
+        self.tls_seconds = 0.0
+        super().__init__(*args, **kwargs)
+
+    def getreply(self):
+        code, message = super().getreply()
+        self.metrics.increment(METRIC_REPLIES, {'code': code})
+        return code, message
+
+
+class _MeteredSMTP_SSL(_MeteredSMTP, smtplib.SMTP_SSL):
+    # Der TLS-Handshake wird getrennt vom Verbindungsaufbau gemessen
+
+    def _get_socket(self, host, port, timeout):
+        sock = smtplib.SMTP._get_socket(self, host, port, timeout)
+        started = time.perf_counter()
+        sock = self.context.wrap_socket(sock, server_hostname=self._host)
+        self.tls_seconds = time.perf_counter() - started
+        return sock
+
+
+def open_connection(smtp_server, option, timeout=10, metrics=None):
+    """
+    Öffnet eine SMTP-Verbindung mit der angegebenen Verbindungsart (ohne Anmeldung).
+
+    Die Dauer von Verbindungsaufbau und TLS sowie die Antwortcodes werden in metrics erfasst.
+    """
+    metrics = metrics or default_registry
+    port = option['port']
+    mode = option['mode']
+    started = time.perf_counter()
+    server = None
+    try:
+        if mode == 'ssl':
+            context = ssl.create_default_context()
+            server = _MeteredSMTP_SSL(smtp_server, port, timeout=timeout, context=context, metrics=metrics)
+        else:
+            server = _MeteredSMTP(smtp_server, port, timeout=timeout, metrics=metrics)
+        server.ehlo()
+    except (smtplib.SMTPException, OSError) as e:
+        phase = 'tls' if isinstance(e, ssl.SSLError) else 'connect'
+        metrics.increment(METRIC_PHASE_ERRORS, {'phase': phase})
+        if server is not None:
+            server.close()
+        raise
+    _observe_connect(metrics, started, server.tls_seconds)
+    if mode == 'starttls':
+        try:
+            with _phase(metrics, 'tls'):
+                server.starttls(context=ssl.create_default_context())
+                server.ehlo()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+            raise
+    return server
+
+
+def _close_quietly(server):
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+def probe_transports(smtp_server, options=None, timeout=10, stagger=PROBE_STAGGER_SECONDS, metrics=None):
+    """
+    Testet die Verbindungsarten gleichzeitig (ähnlich Happy Eyeballs), ohne Angabe nur TLS_SMTP_OPTIONS.
+
+    Die Versuche starten in der Reihenfolge von options jeweils um stagger Sekunden versetzt;
+    schlagen alle früheren Versuche fehl, startet der nächste sofort. Die erste Verbindung,
+    die TLS und EHLO abgeschlossen hat, gewinnt, alle anderen werden geschlossen.
+    timings enthält je Versuch Port, Verbindungsart, Dauer in Sekunden und ggf. den Fehler.
+    """
+    options = list(options if options is not None else TLS_SMTP_OPTIONS)
+    timings = [
+        {'port': option['port'], 'mode': option['mode'], 'seconds': None, 'error': None, 'won': False}
+        for option in options
+    ]
+    state = {'winner': None, 'finished': 0}
+    failed = set()
+    condition = threading.Condition()
+    race_start = time.monotonic()
+
+    def probe(index, option):
+        deadline = race_start + stagger * index
+        with condition:
+            # Warten, bis der Versuch an der Reihe ist oder alle vorherigen fehlgeschlagen sind
+            while state['winner'] is None and not failed.issuperset(range(index)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                condition.wait(remaining)
+            if state['winner'] is not None:
+                timings[index]['error'] = "nicht gestartet"
+                state['finished'] += 1
+                condition.notify_all()
+                return
+
+        start = time.monotonic()
+        try:
+            server = open_connection(smtp_server, option, timeout=timeout, metrics=metrics)
+        except (smtplib.SMTPException, OSError) as e:
+            with condition:
+                timings[index]['seconds'] = time.monotonic() - start
+                timings[index]['error'] = str(e) or e.__class__.__name__
+                failed.add(index)
+                state['finished'] += 1
+                condition.notify_all()
+            return
+
+        with condition:
+            timings[index]['seconds'] = time.monotonic() - start
+            state['finished'] += 1
+            if state['winner'] is None:
+                state['winner'] = (option, server)
+                timings[index]['won'] = True
+                condition.notify_all()
+                return
+            condition.notify_all()
+        # Ein anderer Versuch war schneller
+        _close_quietly(server)
+
+    for index, option in enumerate(options):
+        threading.Thread(target=probe, args=(index, option), daemon=True).start()
+
+    with condition:
+        while state['winner'] is None and state['finished'] < len(options):
+            condition.wait()
+        winner = state['winner']
+        snapshot = [dict(entry) for entry in timings]
+
+    if winner is None:
+        return ProbeResult(None, None, snapshot)
+    return ProbeResult(winner[0], winner[1], snapshot)
+
+
+def format_probe_report(smtp_server, result):
+    """
+    Beschreibt das Ergebnis von probe_transports als lesbaren Text.
+    """
+    if result.option is not None:
+        lines = [f"SMTP-Verbindungstest für {smtp_server}: Port {result.option['port']} ({result.option['mode']}) gewonnen."]
+    else:
+        lines = [f"SMTP-Verbindungstest für {smtp_server}: Keine Verbindungsart erfolgreich."]
+    for entry in result.timings:
+        if entry['error'] == "nicht gestartet":
+            status = "nicht gestartet"
+        elif entry['seconds'] is None:
+            status = "nicht abgewartet"
+        elif entry['error']:
+            status = f"{entry['seconds']:.3f} s, Fehler: {entry['error']}"
+        else:
+            status = f"{entry['seconds']:.3f} s, OK"
+        lines.append(f"  Port {entry['port']} ({entry['mode']}): {status}")
+    return "\n".join(lines)
+
+
+def build_message(sender_email, recipient_email, subject, body):
     msg = MIMEMultipart('alternative')
     msg['From'] = sender_email
-    msg['To'] = recipient_email
+    if recipient_email is not None:
+        msg['To'] = recipient_email
     msg['Subject'] = subject
 
     # Plain-Text-Version (entfernt HTML-Tags)
@@ -18,36 +309,947 @@ def send_email(smtp_server, sender_email, sender_password, recipient_email, subj
 
     msg.attach(part1)
     msg.attach(part2)
+    return msg
 
-    # Define SMTP ports and methods
-    smtp_options = [
-        {'port': 465, 'use_ssl': True},  # SSL
-        {'port': 587, 'use_ssl': False}, # TLS
-        {'port': 25, 'use_ssl': False},  # Plain
-    ]
 
-    for option in smtp_options:
-        port = option['port']
-        use_ssl = option['use_ssl']
+def is_throttling_error(error):
+    """
+    Erkennt Drosselungsantworten des Servers (421, 451 oder erweiterter Status 4.7.x).
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return any(_is_throttling_reply(code, response) for code, response in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return _is_throttling_reply(error.smtp_code, error.smtp_error)
+    return False
+
+
+def _is_throttling_reply(code, response):
+    if code in (421, 451):
+        return True
+    if isinstance(response, bytes):
+        response = response.decode('ascii', 'replace')
+    return 400 <= code < 500 and re.match(r'\s*4\.7\.\d+', str(response)) is not None
+
+
+def _all_refused(recipients, refused):
+    return {
+        recipient: refused.get(recipient, (421, b'Verbindung vom Server beendet'))
+        for recipient in recipients
+    }
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _TokenBucket:
+    # Token-Bucket als "theoretische Ankunftszeit" (GCRA): kein Timer, nur Zeitrechnung
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tat = 0.0
+
+    def interval(self, factor):
+        return 1.0 / (self.rate * factor)
+
+    def earliest(self, factor):
+        # Es dürfen bis zu capacity Nachrichten ohne Wartezeit vorgezogen werden
+        return self.tat - (self.capacity - 1) * self.interval(factor)
+
+
+class RateLimiter:
+    """
+    Adaptiver Token-Bucket für den Versand mit Grenzen pro Sekunde und pro Minute (0 = unbegrenzt).
+
+    Meldet der Server eine Drosselung, halbiert on_throttled() die Rate und pausiert den Versand
+    mit exponentiell wachsender Wartezeit; on_success() hebt die Rate danach schrittweise wieder an.
+    Meldungen während einer laufenden Pause gehören zur selben Drosselung und werden nicht erneut gezählt,
+    sonst würde jede parallele Verbindung, die dieselbe Drosselung sieht, die Rate nochmals halbieren.
+    Ohne feste Grenze wird bei der ersten Drosselung die bisher gemessene Rate als Obergrenze verwendet.
+    Thread-sicher; reserve() gibt die Wartezeit zurück, damit auch asyncio es nutzen kann.
+    clock liefert die Zeit in Sekunden (Standard time.monotonic) und lässt sich in Tests ersetzen.
+    """
+
+    def __init__(self, per_second=0, per_minute=0, min_factor=0.05, recovery_step=0.01,
+                 max_backoff=60.0, clock=time.monotonic):
+        self.per_second = per_second
+        self.per_minute = per_minute
+        self.min_factor = min_factor
+        self.recovery_step = recovery_step
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.factor = 1.0
+        self._lock = threading.Lock()
+        self._buckets = []
+        if per_second:
+            self._buckets.append(_TokenBucket(float(per_second), max(1.0, float(per_second))))
+        if per_minute:
+            self._buckets.append(_TokenBucket(per_minute / 60.0, max(1.0, float(per_minute))))
+        self._blocked_until = 0.0
+        self._backoff = 0.0
+        self._started = None
+        self._granted = 0
+
+    def reserve(self, count=1):
+        """
+        Reserviert count Nachrichten und gibt die Wartezeit in Sekunden bis zum Versand zurück.
+        """
+        with self._lock:
+            now = self.clock()
+            if self._started is None:
+                self._started = now
+            self._granted += count
+            send_at = max(now, self._blocked_until)
+            for bucket in self._buckets:
+                send_at = max(send_at, bucket.earliest(self.factor))
+            for bucket in self._buckets:
+                bucket.tat = max(bucket.tat, send_at) + count * bucket.interval(self.factor)
+            return send_at - now
+
+    def acquire(self, count=1):
+        delay = self.reserve(count)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, count=1):
+        delay = self.reserve(count)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_throttled(self):
+        with self._lock:
+            now = self.clock()
+            if now < self._blocked_until:
+                # Dieselbe Drosselung, bereits berücksichtigt
+                return
+            if not self._buckets:
+                # Ohne feste Grenze: bisher gemessene Rate als Ausgangspunkt verwenden
+                elapsed = max(now - (self._started or now), 1.0)
+                measured = max(self._granted / elapsed, 1.0)
+                self._buckets.append(_TokenBucket(measured, max(1.0, measured)))
+            self.factor = max(self.min_factor, self.factor * 0.5)
+            self._backoff = min(self.max_backoff, self._backoff * 2 if self._backoff else 1.0)
+            self._blocked_until = max(self._blocked_until, now + self._backoff)
+            # Bereits vergebene Termine nicht vor das Ende der Pause legen
+            for bucket in self._buckets:
+                bucket.tat = max(bucket.tat, self._blocked_until)
+
+    def on_success(self):
+        with self._lock:
+            self._backoff = 0.0
+            if self.factor < 1.0:
+                self.factor = min(1.0, self.factor + self.recovery_step)
+
+
+class MessageTemplate:
+    """
+    Einmal pro Kampagne vorgerenderte Nachricht.
+
+    Inhalt, Kodierung der Text- und HTML-Teile und Punkt-Maskierung für DATA werden nur einmal
+    erzeugt; pro Empfänger wird lediglich der To-Header vorangestellt.
+    """
+
+    def __init__(self, sender_email, subject, body):
+        self.sender_email = sender_email
+        self.subject = subject
+        msg = build_message(sender_email, None, subject, body)
+        payload = msg.as_bytes(policy=policy.compat32.clone(linesep='\r\n'))
+        if not payload.endswith(b'\r\n'):
+            payload += b'\r\n'
+        # Zeilen, die mit einem Punkt beginnen, für DATA maskieren (RFC 5321, 4.5.2)
+        self.payload = re.sub(rb'(?m)^\.', b'..', payload)
+
+    def render(self, recipient_email):
+        """
+        Gibt die fertigen DATA-Bytes für einen Empfänger zurück.
+        """
+        return b'To: ' + self.encode_header(recipient_email) + b'\r\n' + self.payload
+
+    def render_batch(self):
+        """
+        DATA-Bytes für eine Transaktion mit mehreren Empfängern, die sich gegenseitig nicht sehen.
+        """
+        return b'To: ' + UNDISCLOSED_RECIPIENTS + b'\r\n' + self.payload
+
+    @staticmethod
+    def encode_header(value):
+        try:
+            return value.encode('ascii')
+        except UnicodeEncodeError:
+            return Header(value, 'utf-8').encode().encode('ascii')
+
+
+class SMTPSession:
+    """
+    Hält eine authentifizierte SMTP-Verbindung für viele Nachrichten offen.
+
+    Zwischen zwei Nachrichten wird RSET gesendet. Bricht der Server die Verbindung ab,
+    wird sie transparent neu aufgebaut; nach max_messages_per_connection Nachrichten
+    wird die Verbindung erneuert. transport ({'port': ..., 'mode': ...}) legt die
+    Verbindungsart fest; ohne Angabe wird die zuletzt funktionierende wiederverwendet.
+    Die Dauer der einzelnen Phasen (connect, tls, login, rset, data, quit) und die
+    Antwortcodes werden in metrics erfasst.
+    """
+
+    def __init__(self, smtp_server, sender_email, sender_password,
+                 max_messages_per_connection=DEFAULT_MAX_MESSAGES_PER_CONNECTION, timeout=10,
+                 transport=None, cache_file=TRANSPORT_CACHE_FILE, metrics=None):
+        self.smtp_server = smtp_server
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timeout = timeout
+        self.transport = transport
+        self.cache_file = cache_file
+        self.metrics = metrics or default_registry
+        self.probe_result = None
+        self.option = None
+        self.server = None
+        self.messages_on_connection = 0
+        self._login_rejected = False
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def connect(self):
+        """
+        Baut die Verbindung auf und meldet sich an.
+
+        Ist eine Verbindungsart fest eingestellt, wird nur diese verwendet. Sonst wird zuerst
+        die zwischengespeicherte probiert und erst danach werden die TLS-Verbindungsarten gleichzeitig
+        getestet. Eine unverschlüsselte Verbindung wird nur versucht, wenn keine TLS-Verbindung
+        zustande kommt; sie wird nicht zwischengespeichert.
+        """
+        self.close()
+        self._login_rejected = False
+        if self.transport is not None:
+            if self._try_option(self.transport):
+                return
+            raise SMTPConnectionFailed(
+                f"Verbindung zu {self.smtp_server} auf Port {self.transport['port']} ({self.transport['mode']}) fehlgeschlagen."
+            )
+
+        cached = load_cached_transport(self.smtp_server, self.cache_file)
+        if cached is not None and cached['mode'] == 'plain':
+            # Unverschlüsselt darf nicht vor TLS gewählt werden (Eintrag einer älteren Version)
+            forget_cached_transport(self.smtp_server, self.cache_file)
+            cached = None
+        if cached is not None:
+            if self._try_option(cached):
+                return
+            # Gespeicherte Verbindungsart funktioniert nicht mehr
+            forget_cached_transport(self.smtp_server, self.cache_file)
+
+        # Alle übrigen TLS-Verbindungsarten gleichzeitig testen
+        candidates = [option for option in TLS_SMTP_OPTIONS if option != cached]
+        result = probe_transports(self.smtp_server, candidates, timeout=self.timeout, metrics=self.metrics)
+        self.probe_result = result
+        print(format_probe_report(self.smtp_server, result))
+        if result.option is not None:
+            if self._login(result.server, result.option):
+                save_cached_transport(self.smtp_server, result.option, self.cache_file)
+                return
+            # Anmeldung fehlgeschlagen: die anderen erreichbaren Verbindungsarten der Reihe nach probieren
+            for option, entry in zip(candidates, result.timings):
+                connect_failed = entry['error'] is not None and entry['seconds'] is not None
+                if option == result.option or connect_failed:
+                    continue
+                if self._try_option(option):
+                    save_cached_transport(self.smtp_server, option, self.cache_file)
+                    return
+
+        # Erst wenn keine TLS-Verbindung möglich ist: unverschlüsselt, ohne Zwischenspeichern.
+        # Hat ein TLS-Server die Anmeldung abgelehnt, wird das Passwort nicht unverschlüsselt erneut gesendet.
+        if self._login_rejected:
+            raise SMTPConnectionFailed(f"Anmeldung an {self.smtp_server} fehlgeschlagen.")
+        for option in PLAIN_SMTP_OPTIONS:
+            if self._try_option(option):
+                print(f"Warnung: Verbindung zu {self.smtp_server} auf Port {option['port']} ist unverschlüsselt.")
+                return
+        # Wenn alle Versuche fehlschlagen
+        raise SMTPConnectionFailed(f"Alle Verbindungsversuche zu {self.smtp_server} sind fehlgeschlagen.")
+
+    def _try_option(self, option):
+        try:
+            server = open_connection(self.smtp_server, option, timeout=self.timeout, metrics=self.metrics)
+        except (smtplib.SMTPException, OSError) as e:
+            print(f"Fehler beim Verbinden mit {self.smtp_server} auf Port {option['port']} ({option['mode']}): {e}")
+            return False
+        return self._login(server, option)
+
+    def _login(self, server, option):
         try:
-            if use_ssl:
-                context = ssl.create_default_context()
-                with smtplib.SMTP_SSL(smtp_server, port, timeout=10, context=context) as server:
-                    server.login(sender_email, sender_password)
-                    server.send_message(msg)
-                    return True
+            with _phase(self.metrics, 'login'):
+                server.login(self.sender_email, self.sender_password)
+        except (smtplib.SMTPException, OSError) as e:
+            print(f"Fehler bei der Anmeldung an {self.smtp_server} auf Port {option['port']} ({option['mode']}): {e}")
+            _close_quietly(server)
+            self._login_rejected = True
+            return False
+        self.server = server
+        self.option = option
+        self.messages_on_connection = 0
+        return True
+
+    def send_message(self, msg):
+        """
+        Sendet eine Nachricht über die bestehende Verbindung.
+        """
+        self._with_connection(lambda: self.server.send_message(msg))
+
+    def send_template(self, template, recipient_email):
+        """
+        Sendet eine vorgerenderte Nachricht (MessageTemplate) an einen Empfänger.
+        """
+        data = template.render(recipient_email)
+        self._with_connection(lambda: self._transaction([recipient_email], data))
+
+    def send_template_batch(self, template, recipients):
+        """
+        Sendet eine vorgerenderte Nachricht in einer Transaktion an mehrere Empfänger.
+
+        Gibt die einzeln abgelehnten Empfänger als {email: (code, response)} zurück.
+        """
+        data = template.render_batch()
+        return self._with_connection(lambda: self._transaction(recipients, data))
+
+    def _with_connection(self, send):
+        if self.server is None or self.messages_on_connection >= self.max_messages_per_connection:
+            self.connect()
+        try:
+            return self._send(send)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # Server hat die Verbindung geschlossen: einmal neu verbinden und erneut senden.
+            # Scheitert das, löst connect() SMTPConnectionFailed aus.
+            self.connect()
+            return self._send(send)
+
+    def _send(self, send):
+        if self.messages_on_connection > 0:
+            with _phase(self.metrics, 'rset'):
+                self.server.rset()
+        self.messages_on_connection += 1
+        with _phase(self.metrics, 'data'):
+            return send()
+
+    def _transaction(self, recipients, data):
+        """
+        MAIL FROM, RCPT TO und DATA mit bereits maskierten Daten. Gibt abgelehnte Empfänger zurück.
+
+        Bei mehreren Empfängern und ESMTP PIPELINING werden MAIL FROM und alle RCPT TO
+        in einem Schreibvorgang gesendet und die Antworten danach gelesen.
+        """
+        if len(recipients) > 1 and self.server.has_extn('pipelining'):
+            commands = [f'MAIL FROM:<{self.sender_email}>'] + [f'RCPT TO:<{recipient}>' for recipient in recipients]
+            self.server.send(''.join(command + '\r\n' for command in commands).encode('utf-8'))
+            mail_reply = self.server.getreply()
+            rcpt_replies = [self.server.getreply() for _ in recipients]
+        else:
+            mail_reply = self.server.mail(self.sender_email)
+            rcpt_replies = []
+            if mail_reply[0] == 250:
+                for recipient in recipients:
+                    rcpt_replies.append(self.server.rcpt(recipient))
+                    if rcpt_replies[-1][0] == 421:
+                        break
+        code, response = mail_reply
+        if code != 250:
+            self._close_on_421(code)
+            raise smtplib.SMTPSenderRefused(code, response, self.sender_email)
+        refused = {}
+        for recipient, (code, response) in zip(recipients, rcpt_replies):
+            if code not in (250, 251):
+                refused[recipient] = (code, response)
+        if any(code == 421 for code, response in rcpt_replies):
+            # Verbindung beendet, bevor DATA gesendet wurde: kein Empfänger hat die Nachricht erhalten
+            self._close_on_421(421)
+            raise smtplib.SMTPRecipientsRefused(_all_refused(recipients, refused))
+        if len(refused) == len(recipients):
+            raise smtplib.SMTPRecipientsRefused(refused)
+        self.server.putcmd('data')
+        code, response = self.server.getreply()
+        if code != 354:
+            self._close_on_421(code)
+            raise smtplib.SMTPDataError(code, response)
+        self.server.send(data + b'.\r\n')
+        code, response = self.server.getreply()
+        if code != 250:
+            self._close_on_421(code)
+            raise smtplib.SMTPDataError(code, response)
+        return refused
+
+    def _close_on_421(self, code):
+        # 421: Server beendet die Verbindung, beim nächsten Versand wird neu verbunden
+        if code == 421:
+            self.server.close()
+
+    def close(self):
+        if self.server is not None:
+            with _phase(self.metrics, 'quit'):
+                _close_quietly(self.server)
+            self.server = None
+        self.messages_on_connection = 0
+
+
+class _BulkSenderBase:
+    # Gemeinsame Auswertung der Versandergebnisse für BulkSender und AsyncBulkSender
+
+    def __init__(self, recipients_per_transaction, rate_limiter, metrics):
+        self.recipients_per_transaction = max(1, int(recipients_per_transaction))
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.metrics = metrics or default_registry
+        self.probe_result = None
+        self._lock = threading.Lock()
+        self._success_count = 0
+        self._failure_count = 0
+        self._on_result = None
+        self._connection_error = None
+
+    def _reset(self, on_result):
+        self._success_count = 0
+        self._failure_count = 0
+        self._on_result = on_result
+        self._connection_error = None
+
+    def _interrupt(self, error):
+        # Verbindung dauerhaft verloren: die noch offenen Empfänger werden nicht als fehlgeschlagen
+        # gemeldet, damit sie in der Outbox offen bleiben und der Versand fortgesetzt werden kann
+        with self._lock:
+            if self._connection_error is None:
+                self._connection_error = error
+
+    def _raise_if_interrupted(self):
+        if self._connection_error is not None:
+            raise SMTPConnectionFailed(
+                f"Versand nach {self._success_count + self._failure_count} Empfängern abgebrochen: "
+                f"{self._connection_error}"
+            )
+
+    def _render(self, template, batch):
+        # Mehrere Empfänger pro Transaktion sehen sich gegenseitig nicht
+        if self.recipients_per_transaction > 1:
+            return template.render_batch()
+        return template.render(batch[0])
+
+    def _record_batch(self, batch, refused, retry):
+        """
+        Wertet eine Transaktion aus und gibt die wegen Drosselung erneut zu sendenden Empfänger zurück.
+        """
+        remaining = []
+        for recipient in batch:
+            reply = refused.get(recipient)
+            if reply is None:
+                self._record(recipient, True, None)
+            elif retry and _is_throttling_reply(*reply):
+                remaining.append(recipient)
             else:
-                with smtplib.SMTP(smtp_server, port, timeout=10) as server:
-                    server.ehlo()
-                    if port == 587:
-                        server.starttls(context=ssl.create_default_context())
-                        server.ehlo()
-                    server.login(sender_email, sender_password)
-                    server.send_message(msg)
-                    return True
-        except (smtplib.SMTPException, ConnectionRefusedError, TimeoutError) as e:
-            print(f"Fehler beim Verbinden mit {smtp_server} auf Port {port} ({'SSL' if use_ssl else 'TLS/Plain'}): {e}")
-            continue  # Versuche den nächsten Port
-    # Wenn alle Versuche fehlschlagen
-    print(f"Alle Verbindungsversuche zu {smtp_server} sind fehlgeschlagen.")
+                self._record(recipient, False, smtplib.SMTPRecipientsRefused({recipient: reply}))
+        return remaining
+
+    def _record(self, recipient, success, error):
+        with self._lock:
+            if success:
+                self._success_count += 1
+            else:
+                self._failure_count += 1
+        self.metrics.increment(METRIC_MESSAGES, {'result': 'sent' if success else 'failed'})
+        if self._on_result is not None:
+            self._on_result(recipient, success, error)
+
+
+class BulkSender(_BulkSenderBase):
+    """
+    Verteilt Empfänger über eine gemeinsame Warteschlange auf mehrere langlebige SMTP-Verbindungen.
+
+    Jeder Worker-Thread hält eine eigene SMTPSession. on_result(recipient, success, error)
+    wird nach jeder Nachricht aus dem jeweiligen Worker-Thread aufgerufen. Mit
+    recipients_per_transaction > 1 wird eine Nachricht in einer Transaktion an mehrere
+    Empfänger gesendet (To: undisclosed-recipients). Fallen alle Verbindungen aus, endet der
+    Versand mit SMTPConnectionFailed; die bis dahin nicht gesendeten Empfänger werden nicht gemeldet.
+    """
+
+    def __init__(self, smtp_server, sender_email, sender_password, connections=DEFAULT_CONNECTIONS,
+                 max_messages_per_connection=DEFAULT_MAX_MESSAGES_PER_CONNECTION, transport=None, timeout=10,
+                 rate_limiter=None, recipients_per_transaction=DEFAULT_RECIPIENTS_PER_TRANSACTION, metrics=None):
+        super().__init__(recipients_per_transaction, rate_limiter, metrics)
+        self.smtp_server = smtp_server
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.connections = max(1, int(connections))
+        self.max_messages_per_connection = max_messages_per_connection
+        self.transport = transport
+        self.timeout = timeout
+        self._active_workers = 0
+        self._workers = []
+
+    def _create_session(self):
+        return SMTPSession(
+            self.smtp_server,
+            self.sender_email,
+            self.sender_password,
+            max_messages_per_connection=self.max_messages_per_connection,
+            timeout=self.timeout,
+            transport=self.transport,
+            metrics=self.metrics
+        )
+
+    def send(self, recipients, template, on_result=None):
+        """
+        Sendet die vorgerenderte Nachricht an alle Empfänger und gibt (success_count, failure_count) zurück.
+
+        Die erste Verbindung wird vor dem Start der Worker aufgebaut, damit die Verbindungsart nur
+        einmal erkannt wird; schlägt sie fehl, wird SMTPConnectionFailed ausgelöst. Ebenso, wenn
+        während des Versands alle Verbindungen verloren gehen; bereits gemeldete Ergebnisse bleiben gültig.
+        """
+        self._reset(on_result)
+
+        first_session = self._create_session()
+        first_session.connect()
+        self.probe_result = first_session.probe_result
+
+        jobs = queue.Queue(maxsize=self.connections * 10)
+        self._active_workers = self.connections
+        self._workers = workers = []
+        for index in range(self.connections):
+            session = first_session if index == 0 else self._create_session()
+            worker = threading.Thread(target=self._worker, args=(session, jobs, template), daemon=True)
+            worker.start()
+            workers.append(worker)
+
+        batches = _chunked(recipients, self.recipients_per_transaction)
+        for batch in batches:
+            if not self._put(jobs, batch, workers):
+                # Alle Verbindungen sind ausgefallen: keine weiteren Aufträge erzeugen
+                self._interrupt(SMTPConnectionFailed("Keine SMTP-Verbindung mehr verfügbar."))
+                break
+        for _ in workers:
+            if not self._put(jobs, None, workers):
+                break
+        for worker in workers:
+            worker.join()
+
+        # Aufträge, die nach dem Ausfall des letzten Workers noch in der Warteschlange lagen
+        while True:
+            try:
+                batch = jobs.get_nowait()
+            except queue.Empty:
+                break
+            if batch is not None:
+                self._interrupt(SMTPConnectionFailed("Keine SMTP-Verbindung mehr verfügbar."))
+        self._raise_if_interrupted()
+        return self._success_count, self._failure_count
+
+    def _put(self, jobs, item, workers):
+        # False, sobald kein Worker mehr Aufträge annimmt
+        while self._active_workers > 0 and any(worker.is_alive() for worker in workers):
+            try:
+                jobs.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _worker(self, session, jobs, template):
+        try:
+            while True:
+                batch = jobs.get()
+                if batch is None:
+                    return
+                try:
+                    self._deliver(session, template, batch)
+                except SMTPConnectionFailed as e:
+                    # Verbindung dauerhaft verloren: dieser Worker beendet sich und gibt die
+                    # noch nicht zugestellten Empfänger an die übrigen Verbindungen zurück
+                    with self._lock:
+                        self._active_workers -= 1
+                    if not self._put(jobs, batch, self._workers):
+                        self._interrupt(e)
+                    return
+        finally:
+            session.close()
+
+    def _deliver(self, session, template, batch):
+        # batch wird an Ort und Stelle verkleinert, damit nach einem Verbindungsausfall
+        # nur die noch offenen Empfänger erneut eingereiht werden
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            self.rate_limiter.acquire(len(batch))
+            retry = attempt < MAX_THROTTLE_RETRIES
+            try:
+                if self.recipients_per_transaction > 1:
+                    refused = session.send_template_batch(template, batch)
+                else:
+                    session.send_template(template, batch[0])
+                    refused = {}
+            except SMTPConnectionFailed:
+                raise
+            except smtplib.SMTPRecipientsRefused as e:
+                refused = e.recipients
+            except (smtplib.SMTPException, OSError) as e:
+                if is_throttling_error(e) and retry:
+                    # Server drosselt: Rate senken und dieselbe Nachricht später erneut senden
+                    self.rate_limiter.on_throttled()
+                    continue
+                for recipient in batch:
+                    self._record(recipient, False, e)
+                batch[:] = []
+                return
+            batch[:] = self._record_batch(batch, refused, retry)
+            if not batch:
+                self.rate_limiter.on_success()
+                return
+            # Einzelne Empfänger wurden gedrosselt
+            self.rate_limiter.on_throttled()
+
+
+class AsyncSMTPConnection:
+    """
+    Minimaler SMTP-Client auf Basis von asyncio-Streams (SSL, STARTTLS und unverschlüsselt).
+
+    Fehler werden wie bei smtplib als SMTPException-Unterklassen gemeldet; Phasendauern
+    und Antwortcodes werden wie bei SMTPSession in metrics erfasst.
+    """
+
+    def __init__(self, smtp_server, option, timeout=10, metrics=None):
+        self.smtp_server = smtp_server
+        self.option = option
+        self.timeout = timeout
+        self.metrics = metrics or default_registry
+        self.reader = None
+        self.writer = None
+        self.esmtp_features = {}
+        self.messages_on_connection = 0
+
+    async def connect(self):
+        mode = self.option['mode']
+        context = ssl.create_default_context() if mode in ('ssl', 'starttls') else None
+        started = time.perf_counter()
+        tls_seconds = 0.0
+        phase = 'connect'
+        try:
+            try:
+                self.reader, self.writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.smtp_server, self.option['port']),
+                    self.timeout
+                )
+            except asyncio.TimeoutError:
+                raise smtplib.SMTPConnectError(-1, f"Zeitüberschreitung bei der Verbindung zu {self.smtp_server}")
+            if mode == 'ssl':
+                # Implizites TLS direkt nach dem Verbindungsaufbau, damit der Handshake getrennt messbar ist
+                phase = 'tls'
+                tls_started = time.perf_counter()
+                await self._start_tls(context)
+                tls_seconds = time.perf_counter() - tls_started
+                phase = 'connect'
+            code, response = await self.read_reply()
+            if code != 220:
+                await self.close()
+                raise smtplib.SMTPConnectError(code, response)
+            await self.ehlo()
+        except (smtplib.SMTPException, OSError):
+            self.metrics.increment(METRIC_PHASE_ERRORS, {'phase': phase})
+            raise
+        _observe_connect(self.metrics, started, tls_seconds)
+        if mode == 'starttls':
+            with _phase(self.metrics, 'tls'):
+                code, response = await self.command('STARTTLS')
+                if code != 220:
+                    raise smtplib.SMTPNotSupportedError(f"STARTTLS abgelehnt: {code} {response}")
+                await self._start_tls(context)
+                await self.ehlo()
+
+    async def _start_tls(self, context):
+        await asyncio.wait_for(self.writer.start_tls(context, server_hostname=self.smtp_server), self.timeout)
+
+    async def ehlo(self):
+        code, response = await self.command('EHLO ' + _local_hostname())
+        if code != 250:
+            raise smtplib.SMTPHeloError(code, response)
+        self.esmtp_features = {}
+        for line in response.decode('ascii', 'replace').splitlines()[1:]:
+            keyword, _, params = line.partition(' ')
+            self.esmtp_features[keyword.lower()] = params
+
+    async def login(self, user, password):
+        with _phase(self.metrics, 'login'):
+            await self._login(user, password)
+
+    async def _login(self, user, password):
+        mechanisms = self.esmtp_features.get('auth', '').upper().split()
+        if 'PLAIN' in mechanisms or not mechanisms:
+            token = base64.b64encode(f"\0{user}\0{password}".encode('utf-8')).decode('ascii')
+            code, response = await self.command('AUTH PLAIN ' + token)
+        else:
+            code, response = await self.command('AUTH LOGIN')
+            if code == 334:
+                code, response = await self.command(base64.b64encode(user.encode('utf-8')).decode('ascii'))
+            if code == 334:
+                code, response = await self.command(base64.b64encode(password.encode('utf-8')).decode('ascii'))
+        if code not in (235, 503):
+            raise smtplib.SMTPAuthenticationError(code, response)
+
+    async def send(self, sender_email, recipients, data):
+        """
+        MAIL FROM, RCPT TO und DATA mit bereits maskierten Daten. Gibt abgelehnte Empfänger zurück.
+        """
+        if self.messages_on_connection > 0:
+            with _phase(self.metrics, 'rset'):
+                await self.command('RSET')
+        self.messages_on_connection += 1
+        with _phase(self.metrics, 'data'):
+            return await self._transaction(sender_email, recipients, data)
+
+    async def _transaction(self, sender_email, recipients, data):
+        if len(recipients) > 1 and 'pipelining' in self.esmtp_features:
+            # PIPELINING: MAIL FROM und alle RCPT TO in einem Schreibvorgang
+            commands = [f'MAIL FROM:<{sender_email}>'] + [f'RCPT TO:<{recipient}>' for recipient in recipients]
+            self.writer.write(''.join(command + '\r\n' for command in commands).encode('utf-8'))
+            mail_reply = await self.read_reply()
+            rcpt_replies = [await self.read_reply() for _ in recipients]
+        else:
+            mail_reply = await self.command(f'MAIL FROM:<{sender_email}>')
+            rcpt_replies = []
+            if mail_reply[0] == 250:
+                for recipient in recipients:
+                    rcpt_replies.append(await self.command(f'RCPT TO:<{recipient}>'))
+                    if rcpt_replies[-1][0] == 421:
+                        break
+        code, response = mail_reply
+        if code != 250:
+            await self._close_on_421(code)
+            raise smtplib.SMTPSenderRefused(code, response, sender_email)
+        refused = {}
+        for recipient, (code, response) in zip(recipients, rcpt_replies):
+            if code not in (250, 251):
+                refused[recipient] = (code, response)
+        if any(code == 421 for code, response in rcpt_replies):
+            # Verbindung beendet, bevor DATA gesendet wurde: kein Empfänger hat die Nachricht erhalten
+            await self._close_on_421(421)
+            raise smtplib.SMTPRecipientsRefused(_all_refused(recipients, refused))
+        if len(refused) == len(recipients):
+            raise smtplib.SMTPRecipientsRefused(refused)
+        code, response = await self.command('DATA')
+        if code != 354:
+            await self._close_on_421(code)
+            raise smtplib.SMTPDataError(code, response)
+        self.writer.write(data + b'.\r\n')
+        code, response = await self.read_reply()
+        if code != 250:
+            await self._close_on_421(code)
+            raise smtplib.SMTPDataError(code, response)
+        return refused
+
+    async def _close_on_421(self, code):
+        # 421: Server beendet die Verbindung, sie wird nicht wiederverwendet
+        if code == 421:
+            await self.close()
+
+    async def command(self, line):
+        if self.writer is None:
+            raise smtplib.SMTPServerDisconnected("Nicht verbunden")
+        self.writer.write(line.encode('utf-8') + b'\r\n')
+        return await self.read_reply()
+
+    async def read_reply(self):
+        lines = []
+        while True:
+            try:
+                line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            except (asyncio.TimeoutError, OSError) as e:
+                await self.close()
+                raise smtplib.SMTPServerDisconnected(f"Verbindung zu {self.smtp_server} unterbrochen: {e}")
+            if not line:
+                await self.close()
+                raise smtplib.SMTPServerDisconnected(f"Verbindung zu {self.smtp_server} vom Server geschlossen")
+            lines.append(line[4:].strip())
+            if line[3:4] != b'-':
+                try:
+                    code = int(line[:3])
+                except ValueError:
+                    code = -1
+                self.metrics.increment(METRIC_REPLIES, {'code': code})
+                return code, b'\n'.join(lines)
+
+    async def quit(self):
+        with _phase(self.metrics, 'quit'):
+            try:
+                await self.command('QUIT')
+            except smtplib.SMTPException:
+                pass
+            await self.close()
+
+    async def close(self):
+        writer, self.writer = self.writer, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+@functools.lru_cache(maxsize=None)
+def _local_hostname():
+    return socket.getfqdn()
+
+
+class AsyncBulkSender(_BulkSenderBase):
+    """
+    Versand über asyncio: viele SMTP-Transaktionen gleichzeitig in einem einzigen Thread.
+
+    Ein Semaphore begrenzt die Zahl gleichzeitiger Transaktionen auf concurrency; freie
+    Verbindungen werden wiederverwendet und nach max_messages_per_connection erneuert.
+    Schlägt ein Verbindungsaufbau fehl, werden keine weiteren Transaktionen gestartet und send()
+    löst SMTPConnectionFailed aus; die nicht gesendeten Empfänger werden nicht gemeldet.
+    """
+
+    def __init__(self, smtp_server, sender_email, sender_password, concurrency=DEFAULT_CONNECTIONS,
+                 max_messages_per_connection=DEFAULT_MAX_MESSAGES_PER_CONNECTION, transport=None, timeout=10,
+                 rate_limiter=None, recipients_per_transaction=DEFAULT_RECIPIENTS_PER_TRANSACTION, metrics=None):
+        super().__init__(recipients_per_transaction, rate_limiter, metrics)
+        self.smtp_server = smtp_server
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.concurrency = max(1, int(concurrency))
+        self.max_messages_per_connection = max_messages_per_connection
+        self.transport = transport
+        self.timeout = timeout
+        self._idle = []
+
+    def _resolve_transport(self):
+        # Verbindungsart einmal mit der blockierenden Sitzung ermitteln (Cache, paralleler Test, Anmeldung)
+        session = SMTPSession(
+            self.smtp_server, self.sender_email, self.sender_password,
+            timeout=self.timeout, transport=self.transport, metrics=self.metrics
+        )
+        _local_hostname()
+        try:
+            session.connect()
+            self.probe_result = session.probe_result
+            return session.option
+        finally:
+            session.close()
+
+    async def send(self, recipients, template, on_result=None):
+        """
+        Sendet die vorgerenderte Nachricht an alle Empfänger und gibt (success_count, failure_count) zurück.
+        """
+        self._reset(on_result)
+        loop = asyncio.get_running_loop()
+        option = await loop.run_in_executor(None, self._resolve_transport)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        try:
+            for batch in _chunked(recipients, self.recipients_per_transaction):
+                await semaphore.acquire()
+                if self._connection_error is not None:
+                    # Server nicht mehr erreichbar: keine neuen Verbindungsversuche je Auftrag
+                    semaphore.release()
+                    break
+                task = asyncio.create_task(self._deliver(option, template, batch, semaphore))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            idle, self._idle = self._idle, []
+            await asyncio.gather(*(connection.quit() for connection in idle))
+        self._raise_if_interrupted()
+        return self._success_count, self._failure_count
+
+    async def _deliver(self, option, template, batch, semaphore):
+        try:
+            data = self._render(template, batch)
+            for attempt in range(MAX_THROTTLE_RETRIES + 1):
+                await self.rate_limiter.acquire_async(len(batch))
+                if self._connection_error is not None:
+                    return
+                retry = attempt < MAX_THROTTLE_RETRIES
+                try:
+                    refused = await self._transaction(option, batch, data)
+                except SMTPConnectionFailed as e:
+                    # Kein Fehler dieser Empfänger: sie bleiben offen, der Versand wird beendet
+                    self._interrupt(e)
+                    return
+                except smtplib.SMTPRecipientsRefused as e:
+                    refused = e.recipients
+                except (smtplib.SMTPException, OSError) as e:
+                    if is_throttling_error(e) and retry:
+                        # Server drosselt: Rate senken und dieselbe Nachricht später erneut senden
+                        self.rate_limiter.on_throttled()
+                        continue
+                    for recipient in batch:
+                        self._record(recipient, False, e)
+                    return
+                batch = self._record_batch(batch, refused, retry)
+                if not batch:
+                    self.rate_limiter.on_success()
+                    return
+                # Einzelne Empfänger wurden gedrosselt
+                self.rate_limiter.on_throttled()
+        finally:
+            semaphore.release()
+
+    async def _transaction(self, option, recipients, data):
+        connection = await self._acquire(option)
+        try:
+            return await connection.send(self.sender_email, recipients, data)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # Verbindung verloren: einmal mit neuer Verbindung wiederholen
+            await connection.close()
+            connection = await self._acquire(option, reuse=False)
+            return await connection.send(self.sender_email, recipients, data)
+        finally:
+            await self._release(connection)
+
+    async def _acquire(self, option, reuse=True):
+        while reuse and self._idle:
+            connection = self._idle.pop()
+            if connection.writer is not None:
+                return connection
+        connection = AsyncSMTPConnection(self.smtp_server, option, timeout=self.timeout, metrics=self.metrics)
+        try:
+            await connection.connect()
+            await connection.login(self.sender_email, self.sender_password)
+        except (smtplib.SMTPException, OSError) as e:
+            await connection.close()
+            raise SMTPConnectionFailed(f"Verbindung zu {self.smtp_server} fehlgeschlagen: {e}")
+        return connection
+
+    async def _release(self, connection):
+        if connection.writer is None:
+            return
+        if connection.messages_on_connection >= self.max_messages_per_connection:
+            await connection.quit()
+        else:
+            self._idle.append(connection)
+
+
+def send_email(smtp_server, sender_email, sender_password, recipient_email, subject, body, transport=None,
+               metrics=None):
+    metrics = metrics or default_registry
+    template = MessageTemplate(sender_email, subject, body)
+    try:
+        with SMTPSession(smtp_server, sender_email, sender_password, transport=transport,
+                         metrics=metrics) as session:
+            session.send_template(template, recipient_email)
+        metrics.increment(METRIC_MESSAGES, {'result': 'sent'})
+        return True
+    except SMTPConnectionFailed as e:
+        print(e)
+    except (smtplib.SMTPException, OSError) as e:
+        print(f"Fehler beim Senden an {recipient_email}: {e}")
+    metrics.increment(METRIC_MESSAGES, {'result': 'failed'})
     return False
@@ -0,0 +1,254 @@
+# fake_smtp_server.py
+"""
+Lokaler SMTP-Ersatzserver für Tests und Benchmarks des Versandpfads.
+
+Der Server nimmt Nachrichten an, ohne sie zuzustellen. Antwortverzögerung, Fehlerquoten
+(4xx, 5xx, abgebrochene Verbindungen) und angekündigte Fähigkeiten (PIPELINING, STARTTLS,
+AUTH) sind einstellbar. Mit deterministic=True treten die Fehler in festen Abständen auf
+(bei drop_rate=0.05 jede 20. Nachricht), unabhängig davon, in welcher Reihenfolge die Verbindungen
+bedient werden. Er läuft mit einer eigenen asyncio-Event-Loop in einem Hintergrund-Thread:
+
+    server = FakeSMTPServer(latency=0.005, temp_failure_rate=0.01)
+    host, port = server.start()
+    ...
+    server.stop()
+    print(server.stats)
+"""
+import argparse
+import asyncio
+import random
+import ssl
+import threading
+import time
+
+
+class FakeSMTPServer:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, temp_failure_rate=0.0, perm_failure_rate=0.0,
+                 drop_rate=0.0, pipelining=True, auth=True, starttls=False, implicit_tls=False,
+                 certfile=None, keyfile=None, seed=None, deterministic=False):
+        if (starttls or implicit_tls) and not certfile:
+            raise ValueError("Für STARTTLS oder SSL wird ein Zertifikat (certfile) benötigt.")
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.temp_failure_rate = temp_failure_rate
+        self.perm_failure_rate = perm_failure_rate
+        self.drop_rate = drop_rate
+        self.pipelining = pipelining
+        self.auth = auth
+        self.starttls = starttls
+        self.implicit_tls = implicit_tls
+        self.ssl_context = None
+        if certfile:
+            self.ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            self.ssl_context.load_cert_chain(certfile, keyfile)
+        self.random = random.Random(seed)
+        self.deterministic = deterministic
+        # Aufgelaufene Fehleranteile je Fehlerart für deterministic=True
+        self._fault_credit = {}
+        self.stats = {
+            'connections': 0,
+            'messages': 0,
+            'recipients': 0,
+            'temp_failures': 0,
+            'perm_failures': 0,
+            'drops': 0,
+        }
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def _fault(self, kind, rate):
+        # True, wenn bei dieser Anfrage ein Fehler der Art kind ausgelöst werden soll
+        if not rate:
+            return False
+        if not self.deterministic:
+            return self.random.random() < rate
+        credit = self._fault_credit.get(kind, 0.0) + rate
+        if credit >= 1.0 - 1e-9:
+            self._fault_credit[kind] = credit - 1.0
+            return True
+        self._fault_credit[kind] = credit
+        return False
+
+    def start(self):
+        """
+        Startet den Server im Hintergrund und gibt (host, port) zurück.
+        """
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self.host, self.port
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(asyncio.start_server(
+            self._handle, self.host, self.port,
+            ssl=self.ssl_context if self.implicit_tls else None,
+            backlog=1024
+        ))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            # Offene Verbindungen abbrechen, damit Clients den Ausfall sofort bemerken
+            handlers = asyncio.all_tasks(self._loop)
+            for handler in handlers:
+                handler.cancel()
+            self._loop.run_until_complete(asyncio.gather(*handlers, return_exceptions=True))
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    def _capabilities(self, tls_active):
+        capabilities = ['SIZE 52428800', '8BITMIME']
+        if self.pipelining:
+            capabilities.append('PIPELINING')
+        if self.starttls and not tls_active:
+            capabilities.append('STARTTLS')
+        if self.auth:
+            capabilities.append('AUTH PLAIN LOGIN')
+        return capabilities
+
+    async def _reply(self, writer, line):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(line.encode('ascii') + b'\r\n')
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        self.stats['connections'] += 1
+        tls_active = self.implicit_tls
+        in_transaction = False
+        recipients = 0
+        try:
+            await self._reply(writer, '220 fake-smtp ESMTP ready')
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                command = line.decode('utf-8', 'replace').strip()
+                verb = command.split(' ', 1)[0].upper()
+
+                if verb in ('EHLO', 'HELO'):
+                    capabilities = self._capabilities(tls_active) if verb == 'EHLO' else []
+                    lines = ['fake-smtp'] + capabilities
+                    for capability in lines[:-1]:
+                        writer.write(f'250-{capability}\r\n'.encode('ascii'))
+                    await self._reply(writer, f'250 {lines[-1]}')
+                elif verb == 'STARTTLS' and self.starttls and not tls_active:
+                    await self._reply(writer, '220 2.0.0 Ready to start TLS')
+                    await writer.start_tls(self.ssl_context)
+                    tls_active = True
+                elif verb == 'AUTH' and self.auth:
+                    await self._handle_auth(reader, writer, command)
+                elif verb == 'MAIL':
+                    in_transaction = True
+                    recipients = 0
+                    await self._reply(writer, '250 2.1.0 OK')
+                elif verb == 'RCPT':
+                    if not in_transaction:
+                        await self._reply(writer, '503 5.5.1 Need MAIL command')
+                    elif self._fault('perm', self.perm_failure_rate):
+                        self.stats['perm_failures'] += 1
+                        await self._reply(writer, '550 5.1.1 User unknown')
+                    elif self._fault('temp', self.temp_failure_rate):
+                        self.stats['temp_failures'] += 1
+                        await self._reply(writer, '451 4.7.1 Too many messages, try again later')
+                    else:
+                        recipients += 1
+                        await self._reply(writer, '250 2.1.5 OK')
+                elif verb == 'DATA':
+                    if not recipients:
+                        await self._reply(writer, '554 5.5.1 No valid recipients')
+                        continue
+                    await self._reply(writer, '354 End data with <CR><LF>.<CR><LF>')
+                    while True:
+                        data_line = await reader.readline()
+                        if not data_line:
+                            return
+                        if data_line == b'.\r\n':
+                            break
+                    if self._fault('drop', self.drop_rate):
+                        # Verbindung ohne Antwort abbrechen
+                        self.stats['drops'] += 1
+                        return
+                    self.stats['messages'] += 1
+                    self.stats['recipients'] += recipients
+                    in_transaction = False
+                    recipients = 0
+                    await self._reply(writer, '250 2.0.0 OK queued')
+                elif verb == 'RSET':
+                    in_transaction = False
+                    recipients = 0
+                    await self._reply(writer, '250 2.0.0 OK')
+                elif verb == 'NOOP':
+                    await self._reply(writer, '250 2.0.0 OK')
+                elif verb == 'QUIT':
+                    await self._reply(writer, '221 2.0.0 Bye')
+                    return
+                else:
+                    await self._reply(writer, '502 5.5.2 Command not recognized')
+        except (ConnectionError, asyncio.IncompleteReadError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_auth(self, reader, writer, command):
+        parts = command.split()
+        mechanism = parts[1].upper() if len(parts) > 1 else ''
+        if mechanism == 'PLAIN' and len(parts) < 3:
+            await self._reply(writer, '334 ')
+            await reader.readline()
+        elif mechanism == 'LOGIN':
+            await self._reply(writer, '334 VXNlcm5hbWU6')
+            await reader.readline()
+            await self._reply(writer, '334 UGFzc3dvcmQ6')
+            await reader.readline()
+        await self._reply(writer, '235 2.7.0 Authentication successful')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokaler SMTP-Ersatzserver für Tests und Benchmarks.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2525)
+    parser.add_argument('--latency', type=float, default=0.0, help="Verzögerung je Antwort in Sekunden")
+    parser.add_argument('--temp-failure-rate', type=float, default=0.0, help="Anteil 4xx-Antworten auf RCPT")
+    parser.add_argument('--perm-failure-rate', type=float, default=0.0, help="Anteil 5xx-Antworten auf RCPT")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="Anteil abgebrochener Verbindungen nach DATA")
+    parser.add_argument('--deterministic', action='store_true', help="Fehler in festen Abständen statt zufällig")
+    parser.add_argument('--no-pipelining', action='store_true')
+    parser.add_argument('--certfile', help="Zertifikat für STARTTLS")
+    parser.add_argument('--keyfile')
+    args = parser.parse_args()
+
+    server = FakeSMTPServer(
+        host=args.host, port=args.port, latency=args.latency,
+        temp_failure_rate=args.temp_failure_rate, perm_failure_rate=args.perm_failure_rate,
+        drop_rate=args.drop_rate, deterministic=args.deterministic, pipelining=not args.no_pipelining,
+        starttls=bool(args.certfile), certfile=args.certfile, keyfile=args.keyfile
+    )
+    host, port = server.start()
+    print(f"Fake-SMTP-Server läuft auf {host}:{port} (Strg+C zum Beenden)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(server.stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,57 +2,436 @@ import re
 import logging
 import json
 import os
+import threading
+import asyncio
+import time
+import csv
+import sqlite3
+import bisect
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QLineEdit, QTextEdit, QPushButton, QVBoxLayout, QHBoxLayout,
-    QMessageBox, QListWidget, QListWidgetItem, QComboBox, QDialog, QTextBrowser,
-    QProgressBar, QScrollArea
+    QMessageBox, QListView, QComboBox, QDialog, QTextBrowser,
+    QProgressBar, QScrollArea, QSpinBox, QFileDialog, QAbstractItemView, QInputDialog, QCheckBox
 )
 from PyQt5.QtGui import QFont
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from database import init_db, add_email, get_emails, delete_email
-from openai_manager import generate_marketing_text, generate_email_subject
-from email_manager import send_email
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal, QAbstractListModel, QModelIndex
+from database import (
+    init_db, add_email, get_emails, get_emails_page, search_emails_page, count_emails, email_domain,
+    delete_emails, create_campaign, iter_pending_recipients, count_pending_recipients, update_outbox_status,
+    set_campaign_status, get_unfinished_campaign, get_segments, create_segment, add_emails_to_segment,
+    set_email_status, count_recipients, EMAIL_STATUSES
+)
+from openai_manager import generate_marketing_text, generate_email_subject, generate_marketing_content
+from email_manager import (
+    BulkSender, AsyncBulkSender, MessageTemplate, RateLimiter, SMTPConnectionFailed, format_probe_report,
+    DEFAULT_MAX_MESSAGES_PER_CONNECTION, DEFAULT_PORTS, DEFAULT_CONNECTIONS, DEFAULT_RECIPIENTS_PER_TRANSACTION,
+    ENGINE_THREADS, ENGINE_ASYNCIO
+)
+from metrics import MetricsRegistry
+from import_manager import EMAIL_PATTERN, import_emails
 
 # Logging konfigurieren
 logging.basicConfig(filename='marketing_tool.log', level=logging.INFO,
                     format='%(asctime)s:%(levelname)s:%(message)s')
 
+# Auswahl der SMTP-Verbindungsart in den Einstellungen
+SMTP_MODE_LABELS = {
+    "auto": "Automatisch erkennen",
+    "ssl": "SSL",
+    "starttls": "STARTTLS",
+    "plain": "Unverschlüsselt",
+}
+
+# Versandergebnisse werden gesammelt in die Outbox geschrieben
+OUTBOX_BATCH_SIZE = 200
+OUTBOX_FLUSH_SECONDS = 2.0
+
+# Versandmetriken eines Laufs (Phasendauern, Antwortcodes), werden am Ende überschrieben
+METRICS_JSON_FILE = "send_metrics.json"
+METRICS_PROMETHEUS_FILE = "send_metrics.prom"
+
+# So viele Adressen lädt die Empfängerliste je Schritt beim Scrollen nach
+EMAIL_PAGE_SIZE = 500
+
+# Verzögerung nach der letzten Eingabe im Suchfeld, bevor die Liste gefiltert wird
+EMAIL_SEARCH_DELAY_MS = 250
+
+# Gestreamter Marketingtext wird höchstens in diesem Abstand (Sekunden) im Editor aktualisiert
+STREAM_UPDATE_INTERVAL = 0.075
+
+# Anzeige des Empfängerstatus
+EMAIL_STATUS_LABELS = {
+    'active': "Aktiv",
+    'bounced': "Unzustellbar",
+    'unsubscribed': "Abgemeldet",
+}
+
+# Auswahl der Versand-Engine
+ENGINE_LABELS = {
+    ENGINE_THREADS: "Threads (eine Verbindung je Thread)",
+    ENGINE_ASYNCIO: "asyncio (viele Verbindungen in einem Thread)",
+}
+
 class EmailSenderThread(QThread):
     # Define signals to communicate with the GUI
     finished = pyqtSignal(int, int)  # success_count, failure_count
     error = pyqtSignal(str)
     progress = pyqtSignal(int)       # Fortschritt in Prozent
 
-    def __init__(self, smtp_server, sender_email, sender_password, emails, subject, body):
+    def __init__(self, smtp_server, sender_email, sender_password, emails, subject, body,
+                 max_messages_per_connection=DEFAULT_MAX_MESSAGES_PER_CONNECTION, transport=None,
+                 connections=DEFAULT_CONNECTIONS, engine=ENGINE_THREADS, rate_per_second=0, rate_per_minute=0,
+                 recipients_per_transaction=DEFAULT_RECIPIENTS_PER_TRANSACTION, campaign_id=None, total=None):
         super().__init__()
         self.smtp_server = smtp_server
         self.sender_email = sender_email
         self.sender_password = sender_password
+        # emails darf ein Iterator sein (z. B. iter_pending_recipients); dann wird total für den Fortschritt benötigt
         self.emails = emails
+        self.total = len(emails) if total is None else total
         self.subject = subject
         self.body = body
+        self.max_messages_per_connection = max_messages_per_connection
+        self.transport = transport
+        self.connections = connections
+        self.engine = engine
+        self.rate_per_second = rate_per_second
+        self.rate_per_minute = rate_per_minute
+        self.recipients_per_transaction = recipients_per_transaction
+        self.campaign_id = campaign_id
+        self._progress_lock = threading.Lock()
+        self._processed = 0
+        self._last_progress = -1
+        # Versandergebnisse für die Outbox, werden gesammelt geschrieben
+        self._outbox_lock = threading.Lock()
+        self._outbox_results = []
+        self._outbox_last_flush = time.monotonic()
+        self.metrics = MetricsRegistry()
 
     def run(self):
-        success_count = 0
-        failure_count = 0
-        total_emails = len(self.emails)
-        for index, email in enumerate(self.emails, start=1):
-            sent = send_email(
-                smtp_server=self.smtp_server,
-                sender_email=self.sender_email,
-                sender_password=self.sender_password,
-                recipient_email=email,
-                subject=self.subject,
-                body=self.body
-            )
-            if sent:
-                success_count += 1
+        self._processed = 0
+        self._last_progress = -1
+        self.metrics.reset()
+        template = self.create_template()
+        sender = self.create_sender()
+        try:
+            if self.engine == ENGINE_ASYNCIO:
+                # Alle Transaktionen laufen in einer eigenen Event-Loop dieses Threads
+                success_count, failure_count = asyncio.run(
+                    sender.send(self.emails, template, on_result=self.on_result)
+                )
             else:
-                failure_count += 1
-            progress_percentage = int((index / total_emails) * 100)
-            self.progress.emit(progress_percentage)
+                success_count, failure_count = sender.send(self.emails, template, on_result=self.on_result)
+        except SMTPConnectionFailed as e:
+            # Die Kampagne bleibt 'running', nicht gesendete Empfänger bleiben in der Outbox offen
+            message = str(e)
+            if self.campaign_id is not None:
+                message += "\nDie übrigen Empfänger bleiben offen; der Versand kann beim nächsten Start fortgesetzt werden."
+            self.error.emit(message)
+            return
+        finally:
+            self.flush_outbox()
+            if sender.probe_result is not None:
+                logging.info(format_probe_report(self.smtp_server, sender.probe_result))
+            self.dump_metrics()
+        if self.campaign_id is not None:
+            set_campaign_status(self.campaign_id, 'finished')
         self.finished.emit(success_count, failure_count)
 
+    def create_template(self):
+        """
+        Rendert die Nachricht einmal, pro Empfänger wird nur der To-Header ergänzt.
+        """
+        return MessageTemplate(self.sender_email, self.subject, self.body)
+
+    def create_sender(self):
+        """
+        Erstellt die Versand-Engine: asyncio oder mehrere langlebige SMTP-Verbindungen in Worker-Threads.
+        """
+        sender_class = AsyncBulkSender if self.engine == ENGINE_ASYNCIO else BulkSender
+        return sender_class(
+            self.smtp_server,
+            self.sender_email,
+            self.sender_password,
+            self.connections,
+            max_messages_per_connection=self.max_messages_per_connection,
+            transport=self.transport,
+            rate_limiter=RateLimiter(self.rate_per_second, self.rate_per_minute),
+            recipients_per_transaction=self.recipients_per_transaction,
+            metrics=self.metrics
+        )
+
+    def dump_metrics(self):
+        """
+        Schreibt die Metriken des Laufs als JSON und im Prometheus-Textformat.
+        """
+        logging.info("Versandmetriken:\n" + self.metrics.summary())
+        try:
+            self.metrics.dump(METRICS_JSON_FILE, METRICS_PROMETHEUS_FILE)
+        except OSError as e:
+            logging.error(f"Fehler beim Speichern der Versandmetriken: {e}")
+
+    def on_result(self, email, success, error):
+        """
+        Wird von den Worker-Threads nach jeder Nachricht aufgerufen.
+        """
+        if not success:
+            logging.error(f"Fehler beim Senden an {email}: {error}")
+        if self.campaign_id is not None:
+            self.record_outbox_result(email, success, error)
+        with self._progress_lock:
+            self._processed += 1
+            progress_percentage = min(100, int((self._processed / max(1, self.total)) * 100))
+            if progress_percentage == self._last_progress:
+                return
+            self._last_progress = progress_percentage
+        self.progress.emit(progress_percentage)
+
+    def record_outbox_result(self, email, success, error):
+        """
+        Sammelt ein Versandergebnis und schreibt die Outbox in Blöcken.
+        """
+        status = 'sent' if success else 'failed'
+        with self._outbox_lock:
+            self._outbox_results.append((email, status, str(error) if error else None))
+            due = (len(self._outbox_results) >= OUTBOX_BATCH_SIZE
+                   or time.monotonic() - self._outbox_last_flush >= OUTBOX_FLUSH_SECONDS)
+        if due:
+            self.flush_outbox()
+
+    def flush_outbox(self):
+        """
+        Schreibt alle gesammelten Versandergebnisse in einer Transaktion in die Outbox.
+        """
+        with self._outbox_lock:
+            results, self._outbox_results = self._outbox_results, []
+            self._outbox_last_flush = time.monotonic()
+            if results and self.campaign_id is not None:
+                update_outbox_status(self.campaign_id, results)
+
+class EmailImportThread(QThread):
+    # Import einer Adressliste im Hintergrund, damit die Oberfläche bedienbar bleibt
+    finished = pyqtSignal(int, int, int)  # imported, duplicates, invalid
+    error = pyqtSignal(str)
+    progress = pyqtSignal(int)            # Fortschritt in Prozent
+
+    def __init__(self, file_path):
+        super().__init__()
+        self.file_path = file_path
+        self._last_progress = -1
+
+    def run(self):
+        try:
+            result = import_emails(self.file_path, on_progress=self.on_progress)
+        except (OSError, csv.Error, sqlite3.Error) as e:
+            self.error.emit(str(e))
+            return
+        self.finished.emit(result.imported, result.duplicates, result.invalid)
+
+    def on_progress(self, progress_percentage):
+        if progress_percentage != self._last_progress:
+            self._last_progress = progress_percentage
+            self.progress.emit(progress_percentage)
+
+class GenerationCancelled(Exception):
+    pass
+
+class TextGeneratorThread(QThread):
+    # Generierung im Hintergrund, damit die Oberfläche während der API-Anfragen bedienbar bleibt
+    finished = pyqtSignal(object)  # GeneratedContent
+    error = pyqtSignal(str)
+    text_chunk = pyqtSignal(str)   # neuer Teil des gestreamten Marketingtexts, gebündelt
+
+    def __init__(self, product_description, product_link, api_key, model, use_cache=True, single_request=False):
+        super().__init__()
+        self.product_description = product_description
+        self.product_link = product_link
+        self.api_key = api_key
+        self.model = model
+        self.use_cache = use_cache
+        self.single_request = single_request
+        self._cancelled = threading.Event()
+        self._pending_chunks = []
+        self._last_chunk_emit = 0.0
+
+    def run(self):
+        try:
+            content = generate_marketing_content(
+                self.product_description, self.product_link, self.api_key,
+                model=self.model, use_cache=self.use_cache, on_text_chunk=self.on_text_chunk,
+                single_request=self.single_request
+            )
+        except Exception as e:
+            if not self.is_cancelled():
+                self.error.emit(str(e))
+            return
+        # Nach einem Abbruch wird das Ergebnis verworfen (im Antwort-Cache bleibt es erhalten)
+        if not self.is_cancelled():
+            self.finished.emit(content)
+
+    def on_text_chunk(self, delta):
+        """
+        Sammelt die Tokens des Marketingtexts und gibt sie gebündelt weiter, statt je Token neu zu zeichnen.
+        """
+        if self.is_cancelled():
+            # Beendet die gestreamte Anfrage
+            raise GenerationCancelled()
+        self._pending_chunks.append(delta)
+        now = time.monotonic()
+        if now - self._last_chunk_emit >= STREAM_UPDATE_INTERVAL:
+            self._last_chunk_emit = now
+            chunk, self._pending_chunks = ''.join(self._pending_chunks), []
+            self.text_chunk.emit(chunk)
+
+    def cancel(self):
+        """
+        Bricht die Generierung ab. Der gestreamte Marketingtext endet beim nächsten Token; den Betreff
+        kann openai 0.27 nicht unterbrechen, er endet spätestens nach REQUEST_TIMEOUT im Hintergrund.
+        Das Ergebnis wird verworfen.
+        """
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+class EmailListModel(QAbstractListModel):
+    """
+    Empfängerliste, die seitenweise aus der Datenbank nachgeladen wird.
+
+    Die View fordert über canFetchMore/fetchMore weitere Seiten an, sobald an das Ende gescrollt wird;
+    geladen wird per Keyset-Paginierung ab der letzten geladenen Zeile. Ohne Filter ist die Liste nach
+    ID sortiert, mit Präfix- oder Domainfilter nach Adresse. Die Gesamtzahl stammt aus COUNT.
+    """
+
+    def __init__(self, page_size=EMAIL_PAGE_SIZE):
+        super().__init__()
+        self.page_size = page_size
+        self.prefix = ''
+        self.domain = ''
+        self.total = 0
+        self._rows = []
+        self._keys = []
+        self._exhausted = True
+
+    def set_filter(self, prefix, domain):
+        self.prefix = prefix.strip()
+        self.domain = domain.strip().lstrip('@').lower()
+        self.reload()
+
+    def is_filtered(self):
+        return bool(self.prefix or self.domain)
+
+    def reload(self):
+        """
+        Verwirft alle geladenen Zeilen; die View lädt danach die erste Seite neu.
+        """
+        self.beginResetModel()
+        self._rows = []
+        self._keys = []
+        self.total = count_emails(self.prefix, self.domain)
+        self._exhausted = self.total == 0
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self._rows[index.row()][1]
+        if role == Qt.UserRole:
+            return self._rows[index.row()][0]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        last = self._rows[-1] if self._rows else None
+        if self.is_filtered():
+            rows = search_emails_page(self.prefix, self.domain, last, self.page_size)
+        else:
+            rows = get_emails_page(last[0] if last else 0, self.page_size)
+        if len(rows) < self.page_size:
+            self._exhausted = True
+        if not rows:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self._keys.extend(self._key(row) for row in rows)
+        self.endInsertRows()
+
+    def email(self, row):
+        return self._rows[row][1]
+
+    def _key(self, row):
+        # Sortierschlüssel wie in der Datenbankabfrage (COLLATE NOCASE faltet nur ASCII)
+        if self.is_filtered():
+            return row[1].lower(), row[0]
+        return row[0]
+
+    def matches(self, email):
+        if self.domain and email_domain(email) != self.domain:
+            return False
+        return email.lower().startswith(self.prefix.lower())
+
+    def append_email(self, email_id, email):
+        """
+        Übernimmt eine neu eingefügte Adresse, ohne die Liste neu zu laden.
+        """
+        if not self.matches(email):
+            return
+        self.total += 1
+        row = (email_id, email)
+        position = bisect.bisect_left(self._keys, self._key(row))
+        if position == len(self._rows) and not self._exhausted:
+            # Liegt hinter der zuletzt geladenen Zeile: kommt mit einer späteren Seite
+            return
+        self.beginInsertRows(QModelIndex(), position, position)
+        self._rows.insert(position, row)
+        self._keys.insert(position, self._key(row))
+        self.endInsertRows()
+
+    def remove_rows(self, deleted_rows):
+        """
+        Entfernt gelöschte Zeilen (id, email); zusammenhängende Zeilen in einem Schritt.
+        """
+        deleted_rows = [row for row in deleted_rows if self.matches(row[1])]
+        self.total -= len(deleted_rows)
+        positions = sorted({
+            position for position in map(self._position_of, deleted_rows) if position is not None
+        }, reverse=True)
+        first = last = None
+        for position in positions:
+            if first is not None and position == first - 1:
+                first = position
+                continue
+            if first is not None:
+                self._remove_range(first, last)
+            first = last = position
+        if first is not None:
+            self._remove_range(first, last)
+
+    def _position_of(self, row):
+        # Die geladenen Zeilen sind nach ihrem Schlüssel aufsteigend sortiert
+        key = self._key(row)
+        position = bisect.bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            return position
+        return None
+
+    def _remove_range(self, first, last):
+        self.beginRemoveRows(QModelIndex(), first, last)
+        del self._rows[first:last + 1]
+        del self._keys[first:last + 1]
+        self.endRemoveRows()
+
 class MarketingApp(QWidget):
     def __init__(self):
         super().__init__()
@@ -61,9 +440,14 @@ class MarketingApp(QWidget):
         init_db()
         self.smtp_config_file = "smtp_config.json"
         self.company_config_file = "company_config.json"  # Neue Datei für Firmendaten
+        self.text_thread = None
+        # Abgebrochene Generierungen laufen im Hintergrund aus und werden bis dahin referenziert
+        self.cancelled_text_threads = []
         self.init_ui()
         self.load_smtp_config()
         self.load_company_config()  # Lade Firmendaten beim Start
+        # Nach dem Anzeigen des Fensters auf eine unterbrochene Kampagne prüfen
+        QTimer.singleShot(0, self.check_unfinished_campaign)
 
     def init_ui(self):
         main_layout = QVBoxLayout()
@@ -83,17 +467,53 @@ class MarketingApp(QWidget):
         add_email_button = QPushButton("Hinzufügen")
         add_email_button.setFont(QFont("Arial", 12))
         add_email_button.clicked.connect(self.add_email)
+        import_button = QPushButton("Aus Datei importieren…")
+        import_button.setFont(QFont("Arial", 12))
+        import_button.clicked.connect(self.import_emails_from_file)
+        self.import_button = import_button  # Referenz behalten, um den Button während des Imports zu deaktivieren
         email_layout.addWidget(email_label)
         email_layout.addWidget(self.email_input)
         email_layout.addWidget(add_email_button)
+        email_layout.addWidget(import_button)
         self.scroll_layout.addLayout(email_layout)
 
+        # Fortschritt des Datei-Imports, nur während eines Imports sichtbar
+        self.import_progress_bar = QProgressBar()
+        self.import_progress_bar.setVisible(False)
+        self.scroll_layout.addWidget(self.import_progress_bar)
+
         # Gespeicherte E-Mail-Adressen anzeigen
-        self.email_list = QListWidget()
+        # Virtuelle Liste: nur die geladenen Seiten liegen im Speicher
+        self.email_model = EmailListModel()
+        self.email_list = QListView()
+        self.email_list.setModel(self.email_model)
+        self.email_list.setUniformItemSizes(True)
+        # Mehrfachauswahl mit Umschalt/Strg, damit viele Adressen auf einmal gelöscht werden können
+        self.email_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.email_list_label = QLabel("Gespeicherte E-Mail-Adressen:")
+        self.email_list_label.setFont(QFont("Arial", 12))
         self.refresh_email_list()
-        email_list_label = QLabel("Gespeicherte E-Mail-Adressen:")
-        email_list_label.setFont(QFont("Arial", 12))
-        self.scroll_layout.addWidget(email_list_label)
+        self.scroll_layout.addWidget(self.email_list_label)
+
+        # Suche nach Adressanfang und Filter nach Domain (indizierte Abfragen)
+        search_layout = QHBoxLayout()
+        self.email_search_input = QLineEdit()
+        self.email_search_input.setFont(QFont("Arial", 12))
+        self.email_search_input.setPlaceholderText("Suchen (Anfang der Adresse)…")
+        self.email_domain_input = QLineEdit()
+        self.email_domain_input.setFont(QFont("Arial", 12))
+        self.email_domain_input.setPlaceholderText("Domain, z. B. example.com")
+        # Erst nach einer kurzen Tipp-Pause filtern
+        self.email_search_timer = QTimer(self)
+        self.email_search_timer.setSingleShot(True)
+        self.email_search_timer.setInterval(EMAIL_SEARCH_DELAY_MS)
+        self.email_search_timer.timeout.connect(self.apply_email_filter)
+        self.email_search_input.textChanged.connect(self.email_search_timer.start)
+        self.email_domain_input.textChanged.connect(self.email_search_timer.start)
+        search_layout.addWidget(self.email_search_input)
+        search_layout.addWidget(self.email_domain_input)
+        self.scroll_layout.addLayout(search_layout)
+
         self.scroll_layout.addWidget(self.email_list)
 
         # Button zum Löschen von E-Mails
@@ -102,6 +522,18 @@ class MarketingApp(QWidget):
         delete_email_button.clicked.connect(self.delete_selected_emails)
         self.scroll_layout.addWidget(delete_email_button)
 
+        # Ausgewählte Adressen einem Segment zuordnen oder ihren Status ändern
+        selection_actions_layout = QHBoxLayout()
+        assign_segment_button = QPushButton("Segment zuweisen…")
+        assign_segment_button.setFont(QFont("Arial", 12))
+        assign_segment_button.clicked.connect(self.assign_selected_to_segment)
+        set_status_button = QPushButton("Status ändern…")
+        set_status_button.setFont(QFont("Arial", 12))
+        set_status_button.clicked.connect(self.set_selected_status)
+        selection_actions_layout.addWidget(assign_segment_button)
+        selection_actions_layout.addWidget(set_status_button)
+        self.scroll_layout.addLayout(selection_actions_layout)
+
         # OpenAI API-Schlüssel
         api_key_layout = QHBoxLayout()
         api_key_label = QLabel("OpenAI API-Schlüssel:")
@@ -149,10 +581,36 @@ class MarketingApp(QWidget):
         self.scroll_layout.addLayout(link_layout)
 
         # Button zum Generieren des Textes
+        generate_layout = QHBoxLayout()
         generate_button = QPushButton("Text generieren")
         generate_button.setFont(QFont("Arial", 12))
         generate_button.clicked.connect(self.generate_text)
-        self.scroll_layout.addWidget(generate_button)
+        self.generate_button = generate_button  # Referenz behalten, um den Button während der Generierung zu deaktivieren
+        self.cancel_generation_button = QPushButton("Abbrechen")
+        self.cancel_generation_button.setFont(QFont("Arial", 12))
+        self.cancel_generation_button.clicked.connect(self.cancel_text_generation)
+        self.cancel_generation_button.setVisible(False)
+        # Gleiche Anfragen werden sonst aus dem Antwort-Cache beantwortet
+        self.bypass_cache_checkbox = QCheckBox("Cache umgehen (neu generieren)")
+        self.bypass_cache_checkbox.setFont(QFont("Arial", 12))
+        # Betreff und Text in einer Anfrage (JSON) statt zwei; halbiert Anfragen und Prompt-Tokens
+        self.single_request_checkbox = QCheckBox("Betreff und Text in einer Anfrage")
+        self.single_request_checkbox.setFont(QFont("Arial", 12))
+        self.single_request_checkbox.setToolTip(
+            "Fordert Betreff und Marketingtext als ein JSON-Objekt an (ohne Live-Anzeige). "
+            "Ist die Antwort ungültig, werden beide einzeln generiert."
+        )
+        generate_layout.addWidget(generate_button)
+        generate_layout.addWidget(self.cancel_generation_button)
+        generate_layout.addWidget(self.bypass_cache_checkbox)
+        generate_layout.addWidget(self.single_request_checkbox)
+        self.scroll_layout.addLayout(generate_layout)
+
+        # Laufanzeige während der Generierung (ohne festen Fortschritt)
+        self.generation_progress_bar = QProgressBar()
+        self.generation_progress_bar.setRange(0, 0)
+        self.generation_progress_bar.setVisible(False)
+        self.scroll_layout.addWidget(self.generation_progress_bar)
 
         # Button zur Vorschau des Textes
         preview_button = QPushButton("Vorschau anzeigen")
@@ -286,6 +744,82 @@ class MarketingApp(QWidget):
         password_layout.addWidget(self.password_input)
         smtp_layout.addLayout(password_layout)
 
+        # Verbindungsart (automatisch erkannt oder fest eingestellt)
+        smtp_transport_layout = QHBoxLayout()
+        smtp_transport_label = QLabel("Verbindungsart:")
+        smtp_transport_label.setFont(QFont("Arial", 12))
+        self.smtp_mode_combo = QComboBox()
+        self.smtp_mode_combo.setFont(QFont("Arial", 12))
+        for mode, label in SMTP_MODE_LABELS.items():
+            self.smtp_mode_combo.addItem(label, mode)
+        self.smtp_mode_combo.currentIndexChanged.connect(self.on_smtp_mode_changed)
+        smtp_port_label = QLabel("Port:")
+        smtp_port_label.setFont(QFont("Arial", 12))
+        self.smtp_port_input = QLineEdit()
+        self.smtp_port_input.setFont(QFont("Arial", 12))
+        self.smtp_port_input.setEnabled(False)
+        smtp_transport_layout.addWidget(smtp_transport_label)
+        smtp_transport_layout.addWidget(self.smtp_mode_combo)
+        smtp_transport_layout.addWidget(smtp_port_label)
+        smtp_transport_layout.addWidget(self.smtp_port_input)
+        smtp_layout.addLayout(smtp_transport_layout)
+
+        # Anzahl paralleler SMTP-Verbindungen
+        smtp_connections_layout = QHBoxLayout()
+        smtp_connections_label = QLabel("Parallele Verbindungen:")
+        smtp_connections_label.setFont(QFont("Arial", 12))
+        self.smtp_connections_input = QSpinBox()
+        self.smtp_connections_input.setFont(QFont("Arial", 12))
+        self.smtp_connections_input.setRange(1, 500)
+        self.smtp_connections_input.setValue(DEFAULT_CONNECTIONS)
+        smtp_connections_layout.addWidget(smtp_connections_label)
+        smtp_connections_layout.addWidget(self.smtp_connections_input)
+        smtp_layout.addLayout(smtp_connections_layout)
+
+        # Versand-Engine
+        smtp_engine_layout = QHBoxLayout()
+        smtp_engine_label = QLabel("Versand-Engine:")
+        smtp_engine_label.setFont(QFont("Arial", 12))
+        self.smtp_engine_combo = QComboBox()
+        self.smtp_engine_combo.setFont(QFont("Arial", 12))
+        for engine, label in ENGINE_LABELS.items():
+            self.smtp_engine_combo.addItem(label, engine)
+        smtp_engine_layout.addWidget(smtp_engine_label)
+        smtp_engine_layout.addWidget(self.smtp_engine_combo)
+        smtp_layout.addLayout(smtp_engine_layout)
+
+        # Versandrate (0 = unbegrenzt); bei Drosselung durch den Server wird sie automatisch gesenkt
+        smtp_rate_layout = QHBoxLayout()
+        smtp_rate_second_label = QLabel("Max. E-Mails pro Sekunde:")
+        smtp_rate_second_label.setFont(QFont("Arial", 12))
+        self.smtp_rate_second_input = QSpinBox()
+        self.smtp_rate_second_input.setFont(QFont("Arial", 12))
+        self.smtp_rate_second_input.setRange(0, 10000)
+        self.smtp_rate_second_input.setSpecialValueText("Unbegrenzt")
+        smtp_rate_minute_label = QLabel("pro Minute:")
+        smtp_rate_minute_label.setFont(QFont("Arial", 12))
+        self.smtp_rate_minute_input = QSpinBox()
+        self.smtp_rate_minute_input.setFont(QFont("Arial", 12))
+        self.smtp_rate_minute_input.setRange(0, 1000000)
+        self.smtp_rate_minute_input.setSpecialValueText("Unbegrenzt")
+        smtp_rate_layout.addWidget(smtp_rate_second_label)
+        smtp_rate_layout.addWidget(self.smtp_rate_second_input)
+        smtp_rate_layout.addWidget(smtp_rate_minute_label)
+        smtp_rate_layout.addWidget(self.smtp_rate_minute_input)
+        smtp_layout.addLayout(smtp_rate_layout)
+
+        # Empfänger pro SMTP-Transaktion (1 = persönlicher To-Header, sonst verdeckte Empfänger)
+        smtp_batch_layout = QHBoxLayout()
+        smtp_batch_label = QLabel("Empfänger pro Transaktion:")
+        smtp_batch_label.setFont(QFont("Arial", 12))
+        self.smtp_batch_input = QSpinBox()
+        self.smtp_batch_input.setFont(QFont("Arial", 12))
+        self.smtp_batch_input.setRange(1, 1000)
+        self.smtp_batch_input.setValue(DEFAULT_RECIPIENTS_PER_TRANSACTION)
+        smtp_batch_layout.addWidget(smtp_batch_label)
+        smtp_batch_layout.addWidget(self.smtp_batch_input)
+        smtp_layout.addLayout(smtp_batch_layout)
+
         # Betreff wird entfernt, da er nun automatisch generiert wird
 
         # Button zum Speichern der SMTP-Konfiguration
@@ -296,6 +830,17 @@ class MarketingApp(QWidget):
 
         self.scroll_layout.addLayout(smtp_layout)
 
+        # Empfänger der Kampagne: alle aktiven Adressen oder ein Segment
+        segment_layout = QHBoxLayout()
+        segment_label = QLabel("Empfänger:")
+        segment_label.setFont(QFont("Arial", 12))
+        self.segment_combo = QComboBox()
+        self.segment_combo.setFont(QFont("Arial", 12))
+        self.refresh_segment_combo()
+        segment_layout.addWidget(segment_label)
+        segment_layout.addWidget(self.segment_combo)
+        self.scroll_layout.addLayout(segment_layout)
+
         # Button zum Senden der E-Mails
         send_button = QPushButton("E-Mail senden")
         send_button.setFont(QFont("Arial", 12))
@@ -328,7 +873,7 @@ class MarketingApp(QWidget):
             QPushButton:hover {
                 background-color: #45a049;
             }
-            QLineEdit, QTextEdit, QComboBox, QListWidget {
+            QLineEdit, QTextEdit, QComboBox, QListView {
                 border: 1px solid #ccc;
                 border-radius: 5px;
                 padding: 5px;
@@ -346,60 +891,173 @@ class MarketingApp(QWidget):
         """
         email = self.email_input.text().strip()
         if email and self.validate_email(email):
-            add_email(email)
-            self.refresh_email_list()
+            email_id = add_email(email)
             self.email_input.clear()
+            if email_id is None:
+                QMessageBox.information(self, "Hinweis", "Diese E-Mail-Adresse ist bereits gespeichert.")
+                return
+            # Nur die neue Zeile übernehmen statt die Liste neu zu laden
+            self.email_model.append_email(email_id, email)
+            self.update_email_list_label()
             QMessageBox.information(self, "Erfolg", "E-Mail-Adresse hinzugefügt.")
             logging.info(f"E-Mail-Adresse hinzugefügt: {email}")
         else:
             QMessageBox.warning(self, "Warnung", "Bitte eine gültige E-Mail-Adresse eingeben.")
             logging.warning("Versuch, eine ungültige E-Mail-Adresse hinzuzufügen.")
 
+    def import_emails_from_file(self):
+        """
+        Importiert E-Mail-Adressen aus einer CSV- oder TXT-Datei im Hintergrund.
+        """
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Adressliste importieren", "", "Adresslisten (*.csv *.txt);;Alle Dateien (*)"
+        )
+        if not file_path:
+            return
+
+        self.import_button.setEnabled(False)
+        self.import_progress_bar.setValue(0)
+        self.import_progress_bar.setVisible(True)
+
+        self.import_thread = EmailImportThread(file_path)
+        self.import_thread.progress.connect(self.import_progress_bar.setValue)
+        self.import_thread.finished.connect(self.on_emails_imported)
+        self.import_thread.error.connect(self.on_import_error)
+        self.import_thread.start()
+        logging.info(f"Import der Adressliste gestartet: {file_path}")
+
+    def on_emails_imported(self, imported, duplicates, invalid):
+        """
+        Wird aufgerufen, wenn der Datei-Import abgeschlossen ist.
+        """
+        self.import_button.setEnabled(True)
+        self.import_progress_bar.setVisible(False)
+        self.refresh_email_list()
+
+        summary = f"{imported} neue E-Mail-Adressen importiert."
+        if duplicates:
+            summary += f"\n{duplicates} Adressen waren bereits vorhanden."
+        if invalid:
+            summary += f"\n{invalid} Zeilen ohne gültige E-Mail-Adresse wurden übersprungen."
+        QMessageBox.information(self, "Import abgeschlossen", summary)
+        logging.info(f"Import der Adressliste abgeschlossen: {summary}")
+
+    def on_import_error(self, error_message):
+        """
+        Wird aufgerufen, wenn der Datei-Import fehlschlägt.
+        """
+        self.import_button.setEnabled(True)
+        self.import_progress_bar.setVisible(False)
+        self.refresh_email_list()
+        QMessageBox.critical(self, "Fehler", f"Fehler beim Import der Adressliste: {error_message}")
+        logging.error(f"Fehler beim Import der Adressliste: {error_message}")
+
     def delete_selected_emails(self):
         """
         Löscht die ausgewählten E-Mail-Adressen aus der Liste und der Datenbank.
         """
-        selected_items = self.email_list.selectedItems()
-        if not selected_items:
+        selected_rows = {index.row() for index in self.email_list.selectedIndexes()}
+        if not selected_rows:
             QMessageBox.warning(self, "Warnung", "Bitte wähle mindestens eine E-Mail-Adresse zum Löschen aus.")
             return
 
         confirm = QMessageBox.question(
             self,
             "Bestätigung",
-            f"Möchtest du die ausgewählten {len(selected_items)} E-Mail(s) wirklich löschen?",
+            f"Möchtest du die ausgewählten {len(selected_rows)} E-Mail(s) wirklich löschen?",
             QMessageBox.Yes | QMessageBox.No,
             QMessageBox.No
         )
         if confirm != QMessageBox.Yes:
             return
 
-        for item in selected_items:
-            email = item.text()
-            delete_email(email)
-            self.email_list.takeItem(self.email_list.row(item))
-            logging.info(f"E-Mail-Adresse gelöscht: {email}")
+        # Alle ausgewählten Adressen in einer Transaktion löschen und nur diese Zeilen entfernen
+        deleted_rows = delete_emails(self.email_model.email(row) for row in selected_rows)
+        self.email_list.clearSelection()
+        self.email_model.remove_rows(deleted_rows)
+        self.update_email_list_label()
+        logging.info(f"{len(deleted_rows)} E-Mail-Adressen gelöscht.")
 
         QMessageBox.information(self, "Erfolg", "Ausgewählte E-Mail-Adressen wurden gelöscht.")
 
+    def selected_emails(self):
+        return [self.email_model.email(index.row()) for index in self.email_list.selectedIndexes()]
+
+    def assign_selected_to_segment(self):
+        """
+        Ordnet die ausgewählten Adressen einem bestehenden oder neuen Segment zu.
+        """
+        emails = self.selected_emails()
+        if not emails:
+            QMessageBox.warning(self, "Warnung", "Bitte wähle mindestens eine E-Mail-Adresse aus.")
+            return
+        names = [name for _, name in get_segments()]
+        name, ok = QInputDialog.getItem(
+            self, "Segment zuweisen", "Segment auswählen oder neuen Namen eingeben:", names, 0, True
+        )
+        name = name.strip()
+        if not ok or not name:
+            return
+        added = add_emails_to_segment(create_segment(name), emails)
+        self.refresh_segment_combo()
+        QMessageBox.information(self, "Erfolg", f"{added} E-Mail-Adressen dem Segment \"{name}\" zugeordnet.")
+        logging.info(f"{added} E-Mail-Adressen dem Segment {name} zugeordnet.")
+
+    def set_selected_status(self):
+        """
+        Setzt den Status der ausgewählten Adressen; nur aktive Adressen erhalten neue Kampagnen.
+        """
+        emails = self.selected_emails()
+        if not emails:
+            QMessageBox.warning(self, "Warnung", "Bitte wähle mindestens eine E-Mail-Adresse aus.")
+            return
+        labels = [EMAIL_STATUS_LABELS[status] for status in EMAIL_STATUSES]
+        label, ok = QInputDialog.getItem(self, "Status ändern", "Neuer Status:", labels, 0, False)
+        if not ok:
+            return
+        status = EMAIL_STATUSES[labels.index(label)]
+        changed = set_email_status(emails, status)
+        QMessageBox.information(self, "Erfolg", f"Status von {changed} E-Mail-Adressen auf \"{label}\" gesetzt.")
+        logging.info(f"Status von {changed} E-Mail-Adressen auf {status} gesetzt.")
+
+    def refresh_segment_combo(self):
+        """
+        Füllt die Auswahl der Kampagnenempfänger mit allen Segmenten.
+        """
+        current = self.segment_combo.currentData()
+        self.segment_combo.clear()
+        self.segment_combo.addItem("Alle aktiven Empfänger", None)
+        for segment_id, name in get_segments():
+            self.segment_combo.addItem(f"Segment: {name}", segment_id)
+        index = self.segment_combo.findData(current)
+        self.segment_combo.setCurrentIndex(max(index, 0))
+
     def refresh_email_list(self):
         """
         Aktualisiert die Liste der gespeicherten E-Mail-Adressen.
         """
-        self.email_list.clear()
-        emails = get_emails()
-        for email in emails:
-            self.email_list.addItem(QListWidgetItem(email))
+        self.email_model.reload()
+        self.update_email_list_label()
         logging.info("E-Mail-Liste aktualisiert.")
 
+    def update_email_list_label(self):
+        if self.email_model.is_filtered():
+            self.email_list_label.setText(f"Gespeicherte E-Mail-Adressen (Treffer): {self.email_model.total}")
+        else:
+            self.email_list_label.setText(f"Gespeicherte E-Mail-Adressen: {self.email_model.total}")
+
+    def apply_email_filter(self):
+        """
+        Filtert die Liste nach Adressanfang und Domain.
+        """
+        self.email_model.set_filter(self.email_search_input.text(), self.email_domain_input.text())
+        self.update_email_list_label()
+
     def validate_email(self, email):
         """
-        Validiert die E-Mail-Adresse mit einer Regex.
+        Validiert die E-Mail-Adresse mit der vorkompilierten Regex des Imports.
         """
-        email_pattern = re.compile(
-            r"(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)"
-        )
-        return re.match(email_pattern, email) is not None
+        return EMAIL_PATTERN.match(email) is not None
 
     def save_smtp_config(self):
         """
@@ -415,10 +1073,24 @@ class MarketingApp(QWidget):
             logging.warning("SMTP-Konfiguration speichern abgebrochen: Nicht alle Felder ausgefüllt.")
             return
 
+        smtp_mode = self.smtp_mode_combo.currentData()
+        smtp_port = self.smtp_port_input.text().strip()
+        if smtp_mode != "auto" and not smtp_port.isdigit():
+            QMessageBox.warning(self, "Warnung", "Bitte einen gültigen SMTP-Port eingeben.")
+            logging.warning("SMTP-Konfiguration speichern abgebrochen: Ungültiger Port.")
+            return
+
         smtp_config = {
             "smtp_server": smtp_server,
             "sender_email": sender_email,
-            "password": password
+            "password": password,
+            "smtp_mode": smtp_mode,
+            "smtp_port": int(smtp_port) if smtp_mode != "auto" else None,
+            "smtp_connections": self.smtp_connections_input.value(),
+            "smtp_engine": self.smtp_engine_combo.currentData(),
+            "rate_per_second": self.smtp_rate_second_input.value(),
+            "rate_per_minute": self.smtp_rate_minute_input.value(),
+            "recipients_per_transaction": self.smtp_batch_input.value()
             # "subject": subject  # Entfernt, da Betreff automatisch generiert wird
         }
 
@@ -444,6 +1116,18 @@ class MarketingApp(QWidget):
             self.smtp_server_input.setText(smtp_config.get("smtp_server", ""))
             self.sender_email_input.setText(smtp_config.get("sender_email", ""))
             self.password_input.setText(smtp_config.get("password", ""))
+            mode_index = self.smtp_mode_combo.findData(smtp_config.get("smtp_mode") or "auto")
+            self.smtp_mode_combo.setCurrentIndex(max(mode_index, 0))
+            if smtp_config.get("smtp_port"):
+                self.smtp_port_input.setText(str(smtp_config["smtp_port"]))
+            self.smtp_connections_input.setValue(int(smtp_config.get("smtp_connections", DEFAULT_CONNECTIONS)))
+            engine_index = self.smtp_engine_combo.findData(smtp_config.get("smtp_engine", ENGINE_THREADS))
+            self.smtp_engine_combo.setCurrentIndex(max(engine_index, 0))
+            self.smtp_rate_second_input.setValue(int(smtp_config.get("rate_per_second", 0)))
+            self.smtp_rate_minute_input.setValue(int(smtp_config.get("rate_per_minute", 0)))
+            self.smtp_batch_input.setValue(int(smtp_config.get(
+                "recipients_per_transaction", DEFAULT_RECIPIENTS_PER_TRANSACTION
+            )))
             logging.info("SMTP-Konfiguration erfolgreich geladen.")
         except Exception as e:
             QMessageBox.critical(self, "Fehler", f"Fehler beim Laden der SMTP-Konfiguration: {e}")
@@ -895,42 +1579,127 @@ class MarketingApp(QWidget):
             logging.error("Generierung abgebrochen: Ungültiger API-Schlüssel.")
             return
 
-        try:
-            # Generiere den Marketingtext
-            marketing_text = generate_marketing_text(
-                product_description, 
-                product_link, 
-                api_key, 
-                model=selected_model
-            )
+        # Footer und rechtlichen Hinweis mit den aktuellen Firmeninformationen erstellen
+        self.generation_footer_html = (
+            self.create_footer(company_name, address, phone, company_email, website) + self.create_disclaimer()
+        )
 
-            # Generiere den E-Mail-Betreff
-            email_subject = generate_email_subject(
-                product_description, 
-                product_link, 
-                api_key, 
-                model=selected_model
-            )
+        # Marketingtext und Betreff werden im Hintergrund gleichzeitig generiert
+        self.text_thread = TextGeneratorThread(
+            product_description,
+            product_link,
+            api_key,
+            selected_model,
+            use_cache=not self.bypass_cache_checkbox.isChecked(),
+            single_request=self.single_request_checkbox.isChecked()
+        )
+        self.text_thread.finished.connect(self.on_text_generated)
+        self.text_thread.error.connect(self.on_text_generation_error)
+        self.text_thread.text_chunk.connect(self.on_text_chunk)
+        # Bisheriger Text wird bei Abbruch oder Fehler wiederhergestellt
+        self.text_before_generation = self.text_editor.toHtml()
+        self.streamed_text = ""
+        self.set_generation_busy(True)
+        self.text_thread.start()
 
-            # Speichere den generierten Betreff in einer Instanzvariable
-            self.last_generated_subject = email_subject
+    def set_generation_busy(self, busy):
+        """
+        Zeigt während der Generierung die Laufanzeige und den Abbrechen-Button.
+        """
+        self.generate_button.setEnabled(not busy)
+        self.generate_button.setText("Generiere…" if busy else "Text generieren")
+        self.cancel_generation_button.setVisible(busy)
+        self.generation_progress_bar.setVisible(busy)
+        # Während des Streamings schreibt die Generierung in den Editor
+        self.text_editor.setReadOnly(busy)
 
-            # Erstelle den Footer basierend auf den Firmeninformationen
-            footer_html = self.create_footer(company_name, address, phone, company_email, website)
+    def on_text_chunk(self, chunk):
+        """
+        Zeigt den bisher gestreamten Marketingtext im Editor an.
+        """
+        if self.sender() is not self.text_thread:
+            return
+        self.streamed_text += chunk
+        # Unvollständiges HTML lässt sich nicht stückweise einfügen, daher wird der bisherige Text
+        # neu gesetzt (höchstens MARKETING_MAX_TOKENS Tokens, alle STREAM_UPDATE_INTERVAL Sekunden)
+        self.text_editor.setHtml(re.sub(r'^```html\s*', '', self.streamed_text))
 
-            # Füge den rechtlichen Hinweis hinzu
-            disclaimer_html = self.create_disclaimer()
+    def cancel_text_generation(self):
+        """
+        Bricht die laufende Generierung ab; ihr Ergebnis wird verworfen.
+        """
+        if self.text_thread is None:
+            return
+        self.text_thread.cancel()
+        self.cancelled_text_threads = [thread for thread in self.cancelled_text_threads if thread.isRunning()]
+        self.cancelled_text_threads.append(self.text_thread)
+        self.text_thread = None
+        self.set_generation_busy(False)
+        self.text_editor.setHtml(self.text_before_generation)
+        logging.info("Textgenerierung abgebrochen.")
+
+    def on_text_generated(self, content):
+        """
+        Übernimmt Marketingtext und Betreff aus dem TextGeneratorThread.
+        """
+        if self.sender() is not self.text_thread:
+            # Ergebnis einer abgebrochenen Generierung
+            return
+        self.text_thread = None
+        self.set_generation_busy(False)
+
+        # Schlägt eine der beiden Anfragen fehl, bleibt das Ergebnis der anderen erhalten
+        if content.subject is not None:
+            # Speichere den generierten Betreff in einer Instanzvariable
+            self.last_generated_subject = content.subject
 
+        if content.text is not None:
             # Füge den Footer und den Disclaimer an den generierten Marketingtext an
-            full_body = marketing_text + footer_html + disclaimer_html
+            full_body = content.text + self.generation_footer_html
 
-            # Setze den generierten Betreff und Body in die GUI
+            # Setze den generierten Body in die GUI
             self.text_editor.setHtml(full_body)  # Setze den vollständigen Text als HTML
-            QMessageBox.information(self, "Erfolg", f"Marketingtext und Betreff erfolgreich generiert.\n\nBetreff: {email_subject}")
+        elif self.streamed_text:
+            # Abgebrochener Stream: bisherigen Text wiederherstellen
+            self.text_editor.setHtml(self.text_before_generation)
+
+        if content.text_error is None and content.subject_error is None:
+            QMessageBox.information(self, "Erfolg", f"Marketingtext und Betreff erfolgreich generiert.\n\nBetreff: {content.subject}")
             logging.info("Marketingtext und Betreff erfolgreich generiert.")
-        except Exception as e:
-            QMessageBox.critical(self, "Fehler", f"Fehler bei der Textgenerierung: {e}")
-            logging.error(f"Fehler bei der Textgenerierung: {e}")
+            return
+
+        errors = []
+        if content.text_error is not None:
+            errors.append(f"Marketingtext: {content.text_error}")
+        if content.subject_error is not None:
+            errors.append(f"Betreff: {content.subject_error}")
+        if content.text is not None:
+            QMessageBox.warning(
+                self, "Teilweise generiert",
+                f"Der Marketingtext wurde generiert, der Betreff nicht:\n\n{content.subject_error}\n\n"
+                "Beim erneuten Generieren wird der Marketingtext aus dem Cache übernommen."
+            )
+        elif content.subject is not None:
+            QMessageBox.warning(
+                self, "Teilweise generiert",
+                f"Der Betreff wurde generiert ({content.subject}), der Marketingtext nicht:\n\n{content.text_error}\n\n"
+                "Beim erneuten Generieren wird der Betreff aus dem Cache übernommen."
+            )
+        else:
+            QMessageBox.critical(self, "Fehler", "Fehler bei der Textgenerierung:\n\n" + "\n".join(errors))
+        logging.error("Fehler bei der Textgenerierung: " + "; ".join(errors))
+
+    def on_text_generation_error(self, error_message):
+        """
+        Wird aufgerufen, wenn der TextGeneratorThread unerwartet fehlschlägt.
+        """
+        if self.sender() is not self.text_thread:
+            return
+        self.text_thread = None
+        self.set_generation_busy(False)
+        self.text_editor.setHtml(self.text_before_generation)
+        QMessageBox.critical(self, "Fehler", f"Fehler bei der Textgenerierung: {error_message}")
+        logging.error(f"Fehler bei der Textgenerierung: {error_message}")
 
     def create_footer(self, company_name, address, phone, company_email, website):
         """
@@ -1008,16 +1777,18 @@ class MarketingApp(QWidget):
         logging.info(f"Absender E-Mail: {sender_email}")
         logging.info(f"Betreff: {subject}")
 
-        emails = get_emails()
-        if not emails:
-            QMessageBox.warning(self, "Warnung", "Keine Empfänger-E-Mail-Adressen vorhanden.")
-            logging.warning("E-Mail-Versand abgebrochen: Keine Empfänger-E-Mail-Adressen vorhanden.")
+        # Nur aktive Adressen des gewählten Segments (None = alle) erhalten die Kampagne
+        segment_id = self.segment_combo.currentData()
+        recipient_count = count_recipients(segment_id)
+        if not recipient_count:
+            QMessageBox.warning(self, "Warnung", "Keine aktiven Empfänger-E-Mail-Adressen vorhanden.")
+            logging.warning("E-Mail-Versand abgebrochen: Keine aktiven Empfänger-E-Mail-Adressen vorhanden.")
             return
 
         confirm = QMessageBox.question(
             self,
             "Bestätigung",
-            "Möchtest du die E-Mails jetzt senden?",
+            f"Möchtest du die E-Mails jetzt an {recipient_count} Empfänger senden?",
             QMessageBox.Yes | QMessageBox.No,
             QMessageBox.No
         )
@@ -1025,6 +1796,14 @@ class MarketingApp(QWidget):
             logging.info("E-Mail-Versand abgebrochen durch Benutzer.")
             return
 
+        # Kampagne mit allen Empfängern in der Outbox speichern, damit sie fortgesetzt werden kann
+        campaign_id = create_campaign(sender_email, subject, body, segment_id)
+        self.start_sender_thread(smtp_server, sender_email, password, subject, body, campaign_id)
+
+    def start_sender_thread(self, smtp_server, sender_email, password, subject, body, campaign_id):
+        """
+        Startet den Versand aller offenen Empfänger einer Kampagne in einem separaten Thread.
+        """
         # Deaktiviere den send Button und setze die Fortschrittsanzeige zurück
         self.send_button.setEnabled(False)
         self.progress_bar.setValue(0)
@@ -1034,15 +1813,59 @@ class MarketingApp(QWidget):
             smtp_server=smtp_server,
             sender_email=sender_email,
             sender_password=password,
-            emails=emails,
+            # Empfänger werden während des Versands blockweise aus der Outbox gelesen
+            emails=iter_pending_recipients(campaign_id),
+            total=count_pending_recipients(campaign_id),
             subject=subject,
-            body=body
+            body=body,
+            transport=self.get_smtp_transport(),
+            connections=self.smtp_connections_input.value(),
+            engine=self.smtp_engine_combo.currentData(),
+            rate_per_second=self.smtp_rate_second_input.value(),
+            rate_per_minute=self.smtp_rate_minute_input.value(),
+            recipients_per_transaction=self.smtp_batch_input.value(),
+            campaign_id=campaign_id
         )
         self.thread.finished.connect(self.on_emails_sent)
         self.thread.error.connect(self.on_send_error)
         self.thread.progress.connect(self.update_progress)
         self.thread.start()
-        logging.info("E-Mail-Versand gestartet.")
+        logging.info(f"E-Mail-Versand gestartet (Kampagne {campaign_id}).")
+
+    def check_unfinished_campaign(self):
+        """
+        Bietet an, eine unterbrochene Kampagne mit den noch offenen Empfängern fortzusetzen.
+        """
+        campaign = get_unfinished_campaign()
+        if campaign is None:
+            return
+
+        confirm = QMessageBox.question(
+            self,
+            "Unterbrochene Kampagne",
+            f"Die Kampagne \"{campaign['subject']}\" wurde nicht abgeschlossen.\n"
+            f"{campaign['pending']} Empfänger haben die E-Mail noch nicht erhalten.\n\n"
+            "Möchtest du den Versand jetzt fortsetzen?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        if confirm != QMessageBox.Yes:
+            set_campaign_status(campaign['id'], 'cancelled')
+            logging.info(f"Unterbrochene Kampagne {campaign['id']} verworfen.")
+            return
+
+        smtp_server = self.smtp_server_input.text().strip()
+        password = self.password_input.text().strip()
+        if not all([smtp_server, password]):
+            QMessageBox.warning(self, "Warnung", "Bitte die SMTP-Einstellungen ausfüllen, um die Kampagne fortzusetzen.")
+            logging.warning("Fortsetzen der Kampagne abgebrochen: SMTP-Einstellungen fehlen.")
+            return
+
+        logging.info(f"Setze Kampagne {campaign['id']} fort ({campaign['pending']} offene Empfänger).")
+        self.start_sender_thread(
+            smtp_server, campaign['sender_email'], password,
+            campaign['subject'], campaign['body'], campaign['id']
+        )
 
     def update_progress(self, value):
         """
@@ -1058,7 +1881,7 @@ class MarketingApp(QWidget):
         self.send_button.setEnabled(True)
         self.progress_bar.setValue(100)
 
-        summary = f"{success_count} von {len(get_emails())} E-Mails wurden erfolgreich gesendet."
+        summary = f"{success_count} von {success_count + failure_count} E-Mails wurden erfolgreich gesendet."
         if failure_count > 0:
             summary += f"\n{failure_count} E-Mails konnten nicht gesendet werden."
         QMessageBox.information(self, "Ergebnis", summary)
@@ -1134,6 +1957,30 @@ class MarketingApp(QWidget):
             QMessageBox.critical(self, "Fehler", f"Fehler beim Speichern der Firmeninformationen: {e}")
             logging.error(f"Fehler beim Speichern der Firmeninformationen: {e}")
 
+    def on_smtp_mode_changed(self):
+        """
+        Aktiviert das Port-Feld nur bei fest eingestellter Verbindungsart und setzt den Standard-Port.
+        """
+        smtp_mode = self.smtp_mode_combo.currentData()
+        if smtp_mode == "auto":
+            self.smtp_port_input.clear()
+            self.smtp_port_input.setEnabled(False)
+        else:
+            self.smtp_port_input.setEnabled(True)
+            self.smtp_port_input.setText(str(DEFAULT_PORTS[smtp_mode]))
+
+    def get_smtp_transport(self):
+        """
+        Gibt die fest eingestellte Verbindungsart zurück oder None für automatische Erkennung.
+        """
+        smtp_mode = self.smtp_mode_combo.currentData()
+        smtp_port = self.smtp_port_input.text().strip()
+        if smtp_mode == "auto":
+            return None
+        if not smtp_port.isdigit():
+            return {'port': DEFAULT_PORTS[smtp_mode], 'mode': smtp_mode}
+        return {'port': int(smtp_port), 'mode': smtp_mode}
+
     def load_company_config(self):
         """
         Lädt die Firmeninformationen aus der JSON-Datei, falls vorhanden.
@@ -0,0 +1,105 @@
+# import_manager.py
+"""
+Streamender Import von Adresslisten aus CSV- oder TXT-Dateien.
+
+Die Datei wird zeilenweise gelesen und blockweise mit executemany in die Datenbank geschrieben,
+sodass auch Listen mit mehreren Millionen Zeilen nicht vollständig im Speicher liegen.
+"""
+import csv
+import os
+import re
+from collections import namedtuple
+
+from database import add_emails
+
+# Einmal kompiliert, wird auch für die Eingabe in der GUI verwendet
+EMAIL_PATTERN = re.compile(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$")
+
+# So viele Adressen werden je Transaktion eingefügt
+IMPORT_CHUNK_SIZE = 10000
+
+# Spaltenüberschriften, an denen die E-Mail-Spalte einer CSV-Datei erkannt wird
+EMAIL_COLUMN_NAMES = {'email', 'e-mail', 'mail', 'emailadresse', 'e-mail-adresse', 'email address', 'e-mail address'}
+
+# Ergebnis von import_emails
+ImportResult = namedtuple('ImportResult', ['imported', 'duplicates', 'invalid'])
+
+
+def is_valid_email(email):
+    return EMAIL_PATTERN.match(email) is not None
+
+
+def _clean(cell):
+    return cell.strip().strip('"\'<>').strip()
+
+
+def _detect_dialect(file):
+    sample = file.read(64 * 1024).decode('utf-8', 'replace')
+    file.seek(0)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;\t|')
+    except csv.Error:
+        # Eine Adresse je Zeile oder unbekanntes Trennzeichen
+        return csv.excel
+
+
+def _decoded_lines(file, position):
+    # Liest binär, damit der Fortschritt über die gelesenen Bytes berechnet werden kann
+    for raw_line in file:
+        position[0] += len(raw_line)
+        yield raw_line.decode('utf-8', 'replace').lstrip('\ufeff')
+
+
+def iter_email_chunks(path, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Liest die Datei zeilenweise und liefert je Block (Adressen, ungültige Zeilen, gelesene Bytes).
+
+    Enthält die erste Zeile eine bekannte Spaltenüberschrift, wird nur diese Spalte gelesen;
+    sonst wird je Zeile die erste gültige Adresse übernommen.
+    """
+    position = [0]
+    with open(path, 'rb') as file:
+        reader = csv.reader(_decoded_lines(file, position), _detect_dialect(file))
+        column = None
+        chunk = []
+        invalid = 0
+        for line_number, row in enumerate(reader):
+            if line_number == 0:
+                headers = [_clean(cell).lower() for cell in row]
+                matches = [index for index, header in enumerate(headers) if header in EMAIL_COLUMN_NAMES]
+                if matches:
+                    column = matches[0]
+                    continue
+            if column is not None:
+                cells = [_clean(row[column])] if column < len(row) else []
+            else:
+                cells = (_clean(cell) for cell in row)
+            email = next((cell for cell in cells if EMAIL_PATTERN.match(cell)), None)
+            if email is None:
+                if any(cell.strip() for cell in row):
+                    invalid += 1
+                continue
+            chunk.append(email)
+            if len(chunk) >= chunk_size:
+                yield chunk, invalid, position[0]
+                chunk = []
+                invalid = 0
+        yield chunk, invalid, position[0]
+
+
+def import_emails(path, chunk_size=IMPORT_CHUNK_SIZE, on_progress=None):
+    """
+    Importiert alle gültigen Adressen der Datei; bereits vorhandene werden übersprungen.
+
+    on_progress(prozent) wird nach jedem Block aufgerufen. Gibt ein ImportResult zurück.
+    """
+    total_bytes = os.path.getsize(path) or 1
+    imported = duplicates = invalid = 0
+    for chunk, chunk_invalid, position in iter_email_chunks(path, chunk_size):
+        inserted = add_emails(chunk) if chunk else 0
+        imported += inserted
+        duplicates += len(chunk) - inserted
+        invalid += chunk_invalid
+        if on_progress is not None:
+            on_progress(min(100, int(position * 100 / total_bytes)))
+    return ImportResult(imported, duplicates, invalid)
@@ -0,0 +1,176 @@
+# metrics.py
+"""
+In-Prozess-Metriken für den Versand: Zähler und Zeitmessungen (Histogramme).
+
+Die Registry ist thread-sicher und lässt sich als JSON oder im Prometheus-Textformat ausgeben.
+Ohne eigene Registry schreiben alle Komponenten in default_registry.
+"""
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Obergrenzen der Histogramm-Buckets in Sekunden
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.bucket_counts):
+            self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative_counts(self):
+        total = 0
+        for count in self.bucket_counts:
+            total += count
+            yield total
+
+
+class MetricsRegistry:
+    """
+    Sammelt Zähler (increment) und Dauern (observe, timer) mit optionalen Labels.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def increment(self, name, labels=None, amount=1):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, labels=None):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name, labels=None, error_counter=None):
+        """
+        Misst die Dauer des with-Blocks. Bei einer Ausnahme wird statt der Dauer error_counter erhöht.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            if error_counter is not None:
+                self.increment(error_counter, labels)
+            raise
+        self.observe(name, time.perf_counter() - started, labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_dict(self):
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'mean': histogram.sum / histogram.count if histogram.count else 0.0,
+                    'max': histogram.max,
+                    'buckets': dict(zip(
+                        (str(bound) for bound in histogram.buckets), histogram.cumulative_counts()
+                    )),
+                }
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=4)
+
+    def to_prometheus(self):
+        """
+        Gibt alle Metriken im Prometheus-Textformat (Version 0.0.4) aus.
+        """
+        lines = []
+        with self._lock:
+            declared = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in declared:
+                    lines.append(f"# TYPE {name} counter")
+                    declared.add(name)
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if name not in declared:
+                    lines.append(f"# TYPE {name} histogram")
+                    declared.add(name)
+                for bound, count in zip(histogram.buckets, histogram.cumulative_counts()):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum!r}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """
+        Kurze lesbare Übersicht: Anzahl, Durchschnitt und Maximum je Zeitmessung sowie alle Zähler.
+        """
+        data = self.to_dict()
+        lines = []
+        for histogram in data['histograms']:
+            lines.append(
+                f"{histogram['name']}{_format_labels(tuple(histogram['labels'].items()))}: "
+                f"{histogram['count']} × Ø {histogram['mean'] * 1000:.1f} ms, max {histogram['max'] * 1000:.1f} ms"
+            )
+        for counter in data['counters']:
+            lines.append(f"{counter['name']}{_format_labels(tuple(counter['labels'].items()))}: {counter['value']}")
+        return "\n".join(lines)
+
+    def dump(self, json_file=None, prometheus_file=None):
+        """
+        Schreibt die Metriken in eine JSON- und/oder Prometheus-Datei.
+        """
+        if json_file:
+            with open(json_file, 'w') as file:
+                file.write(self.to_json())
+        if prometheus_file:
+            with open(prometheus_file, 'w') as file:
+                file.write(self.to_prometheus())
+
+
+def _label_key(labels):
+    if not labels:
+        return ()
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+# Gemeinsame Registry für Aufrufe ohne eigene Registry (z. B. send_email)
+default_registry = MetricsRegistry()
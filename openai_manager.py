@@ -2,68 +2,207 @@
 import openai
 import markdown
 import re
+import json
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
-def generate_marketing_text(product_description, product_link, api_key, model="text-davinci-003"):
-    openai.api_key = api_key
+from response_cache import default_cache, make_key
 
-    chat_models = ["gpt-3.5-turbo", "gpt-4", "gpt-4o-mini"]
+CHAT_MODELS = ["gpt-3.5-turbo", "gpt-4", "gpt-4o-mini"]
 
-    try:
-        if model in chat_models:
-            # Verwende den Chat-Completion Endpoint für Chat-Modelle
-            response = openai.ChatCompletion.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Du bist ein hochqualifizierter Marketingprofi mit umfassendem Wissen in den Bereichen digitales Marketing, "
-                            "Content-Erstellung, SEO, Social Media Marketing und Branding. Deine Aufgabe ist es, ansprechende, überzeugende "
-                            "und zielgerichtete Marketingtexte zu erstellen, die Kunden direkt ansprechen und detaillierte Informationen über "
-                            "das Produkt oder die Dienstleistung liefern. Achte darauf, den Ton und den Stil an die Zielgruppe anzupassen und "
-                            "professionelle Marketingstandards einzuhalten. Deine Texte sollen klar, präzise und wirkungsvoll sein, um die "
-                            "Aufmerksamkeit der Kunden zu gewinnen und sie zum Handeln zu motivieren. Integriere den bereitgestellten Produktlink in den Text, indem du ihn als Hyperlink verwendest. Formatiere die Ausgabe in gut strukturiertem HTML ohne Codeblock-Deklarationen."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Erstelle einen ansprechenden Marketingtext für folgendes Produkt: {product_description} Verwende diesen Link, um weitere Informationen zu erhalten: {product_link}"
-                    }
-                ],
-                max_tokens=500,  # Erhöht für detailliertere Texte
-                temperature=0.7,  # Optional: Kreativität anpassen
-            )
-            generated_text = response.choices[0].message['content'].strip()
+# Zeitlimit je API-Anfrage in Sekunden; begrenzt auch, wie lange eine abgebrochene Generierung nachläuft
+REQUEST_TIMEOUT = 60
+
+# Prompts für den Marketingtext
+MARKETING_SYSTEM_PROMPT = (
+    "Du bist ein hochqualifizierter Marketingprofi mit umfassendem Wissen in den Bereichen digitales Marketing, "
+    "Content-Erstellung, SEO, Social Media Marketing und Branding. Deine Aufgabe ist es, ansprechende, überzeugende "
+    "und zielgerichtete Marketingtexte zu erstellen, die Kunden direkt ansprechen und detaillierte Informationen über "
+    "das Produkt oder die Dienstleistung liefern. Achte darauf, den Ton und den Stil an die Zielgruppe anzupassen und "
+    "professionelle Marketingstandards einzuhalten. Deine Texte sollen klar, präzise und wirkungsvoll sein, um die "
+    "Aufmerksamkeit der Kunden zu gewinnen und sie zum Handeln zu motivieren. Integriere den bereitgestellten Produktlink in den Text, indem du ihn als Hyperlink verwendest. Formatiere die Ausgabe in gut strukturiertem HTML ohne Codeblock-Deklarationen."
+)
+MARKETING_USER_PROMPT = (
+    "Erstelle einen ansprechenden Marketingtext für folgendes Produkt: {product_description} "
+    "Verwende diesen Link, um weitere Informationen zu erhalten: {product_link}"
+)
+MARKETING_MAX_TOKENS = 500  # Erhöht für detailliertere Texte
+MARKETING_TEMPERATURE = 0.7  # Optional: Kreativität anpassen
+
+# Prompts für den E-Mail-Betreff
+SUBJECT_SYSTEM_PROMPT = (
+    "Du bist ein KI-Assistent, der prägnante und ansprechende E-Mail-Betreffzeilen für Marketingkampagnen erstellt. "
+    "Deine Betreffzeilen sollen die Aufmerksamkeit der Empfänger auf sich ziehen und zum Öffnen der E-Mail animieren."
+)
+SUBJECT_USER_PROMPT = (
+    "Erstelle einen prägnanten und ansprechenden E-Mail-Betreff für eine Marketingkampagne basierend auf folgendem Produkt:"
+    "\n\nBeschreibung: {product_description}\nLink: {product_link}\n\nBetreff: Ohne Anführungszeichen."
+)
+SUBJECT_MAX_TOKENS = 15
+SUBJECT_COMPLETION_MAX_TOKENS = 50
+SUBJECT_TEMPERATURE = 0.7
+
+# Betreff und Text in einer Anfrage als JSON-Objekt; der Marketing-Prompt wird nur einmal gesendet
+COMBINED_SYSTEM_PROMPT = (
+    MARKETING_SYSTEM_PROMPT + " Erstelle außerdem einen prägnanten und ansprechenden E-Mail-Betreff ohne "
+    "Anführungszeichen, der zum Öffnen der E-Mail animiert. Antworte ausschließlich mit einem JSON-Objekt mit den "
+    "Feldern \"subject\" (Betreff als Text) und \"html_body\" (Marketingtext als HTML)."
+)
+COMBINED_USER_PROMPT = MARKETING_USER_PROMPT
+# Der HTML-Text steht maskiert in einem JSON-String (\" je Attribut, \n je Zeile) und braucht dort mehr
+# Tokens als allein; ein bei max_tokens abgeschnittenes JSON ist ungültig und kostet zwei weitere Anfragen
+COMBINED_MAX_TOKENS = 1200
+# Modelle, die mit response_format ein gültiges JSON-Objekt garantieren
+JSON_MODE_MODELS = ["gpt-3.5-turbo", "gpt-4o-mini"]
+
+# Ergebnis von generate_marketing_content: Text und Betreff oder jeweils die Ausnahme
+GeneratedContent = namedtuple('GeneratedContent', ['text', 'subject', 'text_error', 'subject_error'])
+
+
+def _complete(model, system_prompt, user_prompt, max_tokens, temperature, use_cache=True, on_chunk=None,
+              response_format=None, validate=None):
+    """
+    Fragt das Modell an und gibt den Rohtext der Antwort zurück.
+
+    Chat-Modelle erhalten System- und Benutzer-Prompt als Nachrichten, klassische Modelle beide als
+    einen Prompt. Mit use_cache wird eine gleiche frühere Anfrage aus dem Antwort-Cache beantwortet.
+    Mit on_chunk wird die Antwort gestreamt und on_chunk(teiltext) für jedes Token aufgerufen;
+    eine Ausnahme in on_chunk bricht die Anfrage ab. response_format wird an Chat-Modelle weitergegeben.
+    validate(text) wird vor dem Speichern im Cache aufgerufen, ungültige Antworten werden nicht gespeichert;
+    wurde die Antwort bei max_tokens abgeschnitten, nennt der ValueError das als Ursache.
+    """
+    if model in CHAT_MODELS:
+        prompt = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    else:
+        prompt = f"{system_prompt}\n\n{user_prompt}"
+
+    key = make_key(model, prompt, max_tokens, temperature)
+    if use_cache:
+        cached = default_cache.get(key)
+        if cached is not None:
+            return cached
+
+    stream = on_chunk is not None
+    if model in CHAT_MODELS:
+        # Verwende den Chat-Completion Endpoint für Chat-Modelle
+        options = {'response_format': response_format} if response_format else {}
+        response = openai.ChatCompletion.create(
+            model=model,
+            messages=prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            request_timeout=REQUEST_TIMEOUT,
+            stream=stream,
+            **options
+        )
+        if stream:
+            text, finish_reason = _read_stream(response, lambda choice: choice['delta'].get('content'), on_chunk)
         else:
-            # Verwende den Completion Endpoint für klassische Modelle
-            prompt = (
-                "Du bist ein hochqualifizierter Marketingprofi mit umfassendem Wissen in den Bereichen digitales Marketing, "
-                "Content-Erstellung, SEO, Social Media Marketing und Branding. Deine Aufgabe ist es, ansprechende, überzeugende "
-                "und zielgerichtete Marketingtexte zu erstellen, die Kunden direkt ansprechen und detaillierte Informationen über "
-                "das Produkt oder die Dienstleistung liefern. Achte darauf, den Ton und den Stil an die Zielgruppe anzupassen und "
-                "professionelle Marketingstandards einzuhalten. Deine Texte sollen klar, präzise und wirkungsvoll sein, um die "
-                "Aufmerksamkeit der Kunden zu gewinnen und sie zum Handeln zu motivieren. Integriere den bereitgestellten Produktlink in den Text, indem du ihn als Hyperlink verwendest. Formatiere die Ausgabe in gut strukturiertem HTML ohne Codeblock-Deklarationen.\n\n"
-                f"Erstelle einen ansprechenden Marketingtext für folgendes Produkt: {product_description} Verwende diesen Link, um weitere Informationen zu erhalten: {product_link}"
-            )
-            response = openai.Completion.create(
-                engine=model,
-                prompt=prompt,
-                max_tokens=500,  # Erhöht für detailliertere Texte
-                temperature=0.7,  # Optional: Kreativität anpassen
-            )
-            generated_text = response.choices[0].text.strip()
+            text = response.choices[0].message['content'].strip()
+            finish_reason = response.choices[0].get('finish_reason')
+    else:
+        # Verwende den Completion Endpoint für klassische Modelle
+        response = openai.Completion.create(
+            engine=model,
+            prompt=prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            request_timeout=REQUEST_TIMEOUT,
+            stream=stream,
+        )
+        if stream:
+            text, finish_reason = _read_stream(response, lambda choice: choice['text'], on_chunk)
+        else:
+            text = response.choices[0].text.strip()
+            finish_reason = response.choices[0].get('finish_reason')
+
+    if validate is not None:
+        try:
+            validate(text)
+        except ValueError as e:
+            if finish_reason == 'length':
+                raise ValueError(f"Antwort bei max_tokens={max_tokens} abgeschnitten (finish_reason=length): {e}")
+            raise
+    # Auch bei use_cache=False speichern, damit die neue Antwort beim nächsten Mal verwendet wird
+    default_cache.put(key, model, text)
+    return text
+
+def _read_stream(response, get_delta, on_chunk):
+    # Setzt die gestreamten Teiltexte zusammen, reicht jeden an on_chunk weiter und gibt (text, finish_reason) zurück
+    parts = []
+    finish_reason = None
+    for chunk in response:
+        choice = chunk['choices'][0]
+        delta = get_delta(choice)
+        if delta:
+            parts.append(delta)
+            on_chunk(delta)
+        finish_reason = choice.get('finish_reason') or finish_reason
+    return ''.join(parts).strip(), finish_reason
+
+def _postprocess_marketing_text(generated_text):
+    # Post-Processing: Entferne Codeblock-Deklarationen, falls vorhanden
+    # Entferne ```html und ``` am Anfang und Ende des Textes
+    generated_text = re.sub(r'^```html\s*', '', generated_text)
+    generated_text = re.sub(r'```\s*$', '', generated_text)
+
+    # Überprüfe, ob der Text bereits HTML enthält
+    if not re.search(r'<[^>]+>', generated_text):
+        # Kein HTML erkannt, konvertiere Markdown zu HTML
+        generated_text = markdown.markdown(generated_text)
 
-        # Post-Processing: Entferne Codeblock-Deklarationen, falls vorhanden
-        # Entferne ```html und ``` am Anfang und Ende des Textes
-        generated_text = re.sub(r'^```html\s*', '', generated_text)
-        generated_text = re.sub(r'```\s*$', '', generated_text)
+    return generated_text
 
-        # Überprüfe, ob der Text bereits HTML enthält
-        if not re.search(r'<[^>]+>', generated_text):
-            # Kein HTML erkannt, konvertiere Markdown zu HTML
-            generated_text = markdown.markdown(generated_text)
+def _postprocess_subject(generated_subject):
+    # Nachbearbeitung: Entferne Anführungszeichen, falls vorhanden
+    generated_subject = re.sub(r'^["\']+', '', generated_subject)  # Entferne führende Anführungszeichen
+    generated_subject = re.sub(r'["\']+$', '', generated_subject)  # Entferne abschließende Anführungszeichen
+
+    # Weitere Nachbearbeitung: Entferne unerwünschte Leerzeichen oder Zeichen
+    return generated_subject.strip()
+
+def _parse_combined(text):
+    """
+    Liest die JSON-Antwort der kombinierten Anfrage und gibt (subject, html_body) zurück.
+    Löst ValueError aus, wenn die Antwort kein Objekt mit beiden Feldern als nicht leere Texte ist.
+    """
+    text = re.sub(r'^```(?:json)?\s*', '', text.strip())
+    text = re.sub(r'```\s*$', '', text)
+    data = json.loads(text)  # json.JSONDecodeError ist ein ValueError
+    if not isinstance(data, dict):
+        raise ValueError("Die Antwort ist kein JSON-Objekt.")
+    subject = data.get('subject')
+    html_body = data.get('html_body')
+    if not isinstance(subject, str) or not subject.strip():
+        raise ValueError("Das Feld subject fehlt oder ist leer.")
+    if not isinstance(html_body, str) or not html_body.strip():
+        raise ValueError("Das Feld html_body fehlt oder ist leer.")
+    return subject, html_body
+
+def generate_marketing_text(product_description, product_link, api_key, model="text-davinci-003", use_cache=True,
+                            on_chunk=None):
+    """
+    Generiert den Marketingtext als HTML. Mit on_chunk wird die Antwort gestreamt (siehe _complete);
+    die Nachbearbeitung erfolgt erst am Ende, on_chunk erhält den unbearbeiteten Text.
+    """
+    openai.api_key = api_key
+
+    try:
+        generated_text = _complete(
+            model,
+            MARKETING_SYSTEM_PROMPT,
+            MARKETING_USER_PROMPT.format(product_description=product_description, product_link=product_link),
+            MARKETING_MAX_TOKENS,
+            MARKETING_TEMPERATURE,
+            use_cache=use_cache,
+            on_chunk=on_chunk
+        )
 
-        return generated_text
+        return _postprocess_marketing_text(generated_text)
 
     except openai.error.AuthenticationError:
         raise Exception("Authentifizierungsfehler: Überprüfe deinen API-Schlüssel.")
@@ -72,60 +211,98 @@ def generate_marketing_text(product_description, product_link, api_key, model="t
     except Exception as e:
         raise Exception(f"Ein unerwarteter Fehler ist aufgetreten: {e}")
 
-def generate_email_subject(product_description, product_link, api_key, model="text-davinci-003"):
+def generate_email_subject(product_description, product_link, api_key, model="text-davinci-003", use_cache=True):
     openai.api_key = api_key
 
-    chat_models = ["gpt-3.5-turbo", "gpt-4", "gpt-4o-mini"]
-
     try:
-        if model in chat_models:
-            # Verwende den Chat-Completion Endpoint für Chat-Modelle
-            response = openai.ChatCompletion.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Du bist ein KI-Assistent, der prägnante und ansprechende E-Mail-Betreffzeilen für Marketingkampagnen erstellt. "
-                            "Deine Betreffzeilen sollen die Aufmerksamkeit der Empfänger auf sich ziehen und zum Öffnen der E-Mail animieren."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Erstelle einen prägnanten und ansprechenden E-Mail-Betreff für eine Marketingkampagne basierend auf folgendem Produkt:\n\nBeschreibung: {product_description}\nLink: {product_link}\n\nBetreff: Ohne Anführungszeichen."
-                    }
-                ],
-                max_tokens=15,
-                temperature=0.7,
-            )
-            generated_subject = response.choices[0].message['content'].strip()
-        else:
-            # Verwende den Completion Endpoint für klassische Modelle
-            prompt = (
-                "Du bist ein KI-Assistent, der prägnante und ansprechende E-Mail-Betreffzeilen für Marketingkampagnen erstellt. "
-                "Deine Betreffzeilen sollen die Aufmerksamkeit der Empfänger auf sich ziehen und zum Öffnen der E-Mail animieren.\n\n"
-                f"Erstelle einen prägnanten und ansprechenden E-Mail-Betreff für eine Marketingkampagne basierend auf folgendem Produkt:\n\nBeschreibung: {product_description}\nLink: {product_link}\n\nBetreff: Ohne Anführungszeichen."
-            )
-            response = openai.Completion.create(
-                engine=model,
-                prompt=prompt,
-                max_tokens=50,
-                temperature=0.7,
-            )
-            generated_subject = response.choices[0].text.strip()
+        generated_subject = _complete(
+            model,
+            SUBJECT_SYSTEM_PROMPT,
+            SUBJECT_USER_PROMPT.format(product_description=product_description, product_link=product_link),
+            SUBJECT_MAX_TOKENS if model in CHAT_MODELS else SUBJECT_COMPLETION_MAX_TOKENS,
+            SUBJECT_TEMPERATURE,
+            use_cache=use_cache
+        )
+
+        return _postprocess_subject(generated_subject)
 
-        # Nachbearbeitung: Entferne Anführungszeichen, falls vorhanden
-        generated_subject = re.sub(r'^["\']+', '', generated_subject)  # Entferne führende Anführungszeichen
-        generated_subject = re.sub(r'["\']+$', '', generated_subject)  # Entferne abschließende Anführungszeichen
+    except openai.error.AuthenticationError:
+        raise Exception("Authentifizierungsfehler: Überprüfe deinen API-Schlüssel.")
+    except openai.error.OpenAIError as e:
+        raise Exception(f"OpenAI-Fehler: {e}")
+    except Exception as e:
+        raise Exception(f"Ein unerwarteter Fehler ist aufgetreten: {e}")
 
-        # Weitere Nachbearbeitung: Entferne unerwünschte Leerzeichen oder Zeichen
-        generated_subject = generated_subject.strip()
+def generate_combined_content(product_description, product_link, api_key, model="text-davinci-003", use_cache=True):
+    """
+    Generiert Betreff und Marketingtext in einer Anfrage als JSON-Objekt und gibt (subject, html_body) zurück.
 
-        return generated_subject
+    Modelle aus JSON_MODE_MODELS erhalten response_format json_object. Ist die Antwort kein gültiges
+    Objekt mit beiden Feldern, wird ValueError ausgelöst; API-Fehler werden wie bei den Einzelanfragen gemeldet.
+    """
+    openai.api_key = api_key
 
+    try:
+        text = _complete(
+            model,
+            COMBINED_SYSTEM_PROMPT,
+            COMBINED_USER_PROMPT.format(product_description=product_description, product_link=product_link),
+            COMBINED_MAX_TOKENS,
+            MARKETING_TEMPERATURE,
+            use_cache=use_cache,
+            response_format={"type": "json_object"} if model in JSON_MODE_MODELS else None,
+            validate=_parse_combined
+        )
+    except ValueError:
+        raise
     except openai.error.AuthenticationError:
         raise Exception("Authentifizierungsfehler: Überprüfe deinen API-Schlüssel.")
     except openai.error.OpenAIError as e:
         raise Exception(f"OpenAI-Fehler: {e}")
     except Exception as e:
         raise Exception(f"Ein unerwarteter Fehler ist aufgetreten: {e}")
+
+    subject, html_body = _parse_combined(text)
+    return _postprocess_subject(subject), _postprocess_marketing_text(html_body.strip())
+
+def generate_marketing_content(product_description, product_link, api_key, model="text-davinci-003", use_cache=True,
+                               on_text_chunk=None, single_request=False):
+    """
+    Generiert Marketingtext und E-Mail-Betreff gleichzeitig, die Wartezeit entspricht etwa der
+    langsameren der beiden Anfragen. Mit on_text_chunk wird der Marketingtext gestreamt.
+
+    Mit single_request werden beide in einer Anfrage erzeugt (generate_combined_content); ist die
+    Antwort kein gültiges JSON, werden sie wie sonst mit zwei Anfragen generiert.
+
+    Schlägt eine Anfrage fehl, bleibt das Ergebnis der anderen erhalten: Die Ausnahme steht in
+    text_error bzw. subject_error, der zugehörige Wert ist None. Gibt ein GeneratedContent zurück.
+    """
+    if single_request:
+        try:
+            subject, text = generate_combined_content(
+                product_description, product_link, api_key, model=model, use_cache=use_cache
+            )
+            return GeneratedContent(text, subject, None, None)
+        except ValueError as e:
+            # Ungültige JSON-Antwort: auf zwei Einzelanfragen zurückfallen
+            logging.warning(f"Ungültige JSON-Antwort, Betreff und Text werden einzeln generiert: {e}")
+        except Exception as e:
+            return GeneratedContent(None, None, e, e)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        text_future = executor.submit(
+            generate_marketing_text, product_description, product_link, api_key, model, use_cache, on_text_chunk
+        )
+        subject_future = executor.submit(
+            generate_email_subject, product_description, product_link, api_key, model, use_cache
+        )
+    text = subject = text_error = subject_error = None
+    try:
+        text = text_future.result()
+    except Exception as e:
+        text_error = e
+    try:
+        subject = subject_future.result()
+    except Exception as e:
+        subject_error = e
+    return GeneratedContent(text, subject, text_error, subject_error)
@@ -0,0 +1,128 @@
+# response_cache.py
+"""
+Persistenter Cache für Antworten der OpenAI API.
+
+Der Schlüssel ist ein Hash aus Modell, vollständigem Prompt, max_tokens und temperature; gleiche
+Anfragen werden ohne API-Aufruf aus einer SQLite-Datei neben marketing_tool.db beantwortet.
+Die Größe ist begrenzt (die am längsten nicht genutzten Einträge werden verdrängt), Einträge
+können zusätzlich nach einer Gültigkeitsdauer verfallen.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import database
+
+CACHE_FILE_NAME = 'response_cache.db'
+
+# Höchstzahl gespeicherter Antworten (LRU)
+DEFAULT_MAX_ENTRIES = 1000
+
+# Gültigkeitsdauer in Sekunden, None = unbegrenzt
+DEFAULT_TTL = 30 * 24 * 3600
+
+
+def make_key(model, prompt, max_tokens, temperature):
+    """
+    Inhaltsbasierter Schlüssel; prompt ist der Prompt-Text oder die Liste der Chat-Nachrichten.
+    """
+    payload = json.dumps([model, prompt, max_tokens, temperature], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        if path is None:
+            path = os.path.join(os.path.dirname(os.path.abspath(database.DB_FILE)), CACHE_FILE_NAME)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            with connection:
+                connection.execute('''
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        model TEXT NOT NULL,
+                        response TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_used REAL NOT NULL
+                    )
+                ''')
+                connection.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)')
+            self._connection = connection
+        return self._connection
+
+    def get(self, key):
+        """
+        Gibt die gespeicherte Antwort zurück oder None, wenn sie fehlt oder abgelaufen ist.
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                connection = self._connect()
+                row = connection.execute(
+                    'SELECT response, created_at FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                with connection:
+                    if self.ttl is not None and now - row[1] > self.ttl:
+                        connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                        return None
+                    connection.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, key))
+                return row[0]
+        except sqlite3.Error as e:
+            # Ein defekter Cache darf die Generierung nicht verhindern
+            logging.error(f"Fehler beim Lesen des Antwort-Caches: {e}")
+            return None
+
+    def put(self, key, model, response):
+        """
+        Speichert eine Antwort und verdrängt bei Überschreitung von max_entries die ältesten Einträge.
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                connection = self._connect()
+                with connection:
+                    connection.execute(
+                        'INSERT OR REPLACE INTO responses (key, model, response, created_at, last_used) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        (key, model, response, now, now)
+                    )
+                    excess = connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0] - self.max_entries
+                    if excess > 0:
+                        connection.execute(
+                            'DELETE FROM responses WHERE key IN '
+                            '(SELECT key FROM responses ORDER BY last_used LIMIT ?)',
+                            (excess,)
+                        )
+        except sqlite3.Error as e:
+            logging.error(f"Fehler beim Schreiben des Antwort-Caches: {e}")
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('DELETE FROM responses')
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+# Gemeinsamer Cache für openai_manager
+default_cache = ResponseCache()
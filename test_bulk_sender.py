@@ -0,0 +1,131 @@
+# test_bulk_sender.py
+import asyncio
+import collections
+import threading
+import time
+
+import pytest
+
+from email_manager import BulkSender, AsyncBulkSender, MessageTemplate, RateLimiter, SMTPConnectionFailed
+from fake_smtp_server import FakeSMTPServer
+from metrics import MetricsRegistry
+
+RECIPIENTS = [f'empfaenger{i}@example.com' for i in range(300)]
+
+
+@pytest.fixture
+def server():
+    # 4xx (Drosselung), 5xx und abgebrochene Verbindungen nach DATA, in festen Abständen
+    server = FakeSMTPServer(temp_failure_rate=0.02, perm_failure_rate=0.03, drop_rate=0.05, deterministic=True)
+    server.start()
+    yield server
+    server.stop()
+
+
+def send(server, engine, recipients_per_transaction, max_messages_per_connection=50, after_result=None,
+         results=None, outcomes=None):
+    sender_class = AsyncBulkSender if engine == 'asyncio' else BulkSender
+    sender = sender_class(
+        server.host, 'absender@example.com', 'passwort', 4,
+        max_messages_per_connection=max_messages_per_connection,
+        transport={'port': server.port, 'mode': 'plain'},
+        timeout=5,
+        # Hohe feste Rate und kurze Pausen nach einer Drosselung, damit der Test schnell bleibt
+        rate_limiter=RateLimiter(per_second=10000, max_backoff=0.01),
+        recipients_per_transaction=recipients_per_transaction,
+        metrics=MetricsRegistry()
+    )
+    template = MessageTemplate('absender@example.com', 'Test', '<p>Hallo</p>')
+    # Ergebnisse landen in den übergebenen Sammlungen, damit sie auch nach einer Ausnahme vorliegen
+    results = collections.Counter() if results is None else results
+    outcomes = {} if outcomes is None else outcomes
+    lock = threading.Lock()
+
+    def on_result(recipient, success, error):
+        with lock:
+            results[recipient] += 1
+            outcomes[recipient] = success
+            if after_result is not None:
+                after_result(len(results))
+
+    if engine == 'asyncio':
+        counts = asyncio.run(sender.send(RECIPIENTS, template, on_result=on_result))
+    else:
+        counts = sender.send(RECIPIENTS, template, on_result=on_result)
+    return counts, results, outcomes
+
+
+@pytest.mark.parametrize('engine', ['threads', 'asyncio'])
+@pytest.mark.parametrize('recipients_per_transaction', [1, 5])
+def test_every_recipient_reported_exactly_once(server, engine, recipients_per_transaction):
+    (success_count, failure_count), results, outcomes = send(server, engine, recipients_per_transaction)
+
+    assert set(results) == set(RECIPIENTS)
+    assert set(results.values()) == {1}
+    assert success_count + failure_count == len(RECIPIENTS)
+    assert success_count == sum(outcomes.values())
+    # Als erfolgreich gemeldet heißt: vom Server nach DATA angenommen
+    assert server.stats['recipients'] == success_count
+    assert server.stats['perm_failures'] > 0
+    assert server.stats['temp_failures'] > 0
+    assert server.stats['drops'] > 0
+    assert failure_count >= 1
+
+
+@pytest.mark.parametrize('engine', ['threads', 'asyncio'])
+def test_connections_are_recycled(engine):
+    server = FakeSMTPServer()
+    server.start()
+    try:
+        (success_count, failure_count), results, _ = send(
+            server, engine, recipients_per_transaction=1, max_messages_per_connection=20
+        )
+    finally:
+        server.stop()
+    assert (success_count, failure_count) == (len(RECIPIENTS), 0)
+    assert server.stats['messages'] == len(RECIPIENTS)
+    # Nach max_messages_per_connection wird die Verbindung neu aufgebaut
+    assert server.stats['connections'] >= len(RECIPIENTS) // 20
+
+
+def test_pipelined_rcpt_replies_are_matched_per_recipient():
+    # Jeder dritte RCPT wird abgelehnt; mit PIPELINING kommen alle Antworten gebündelt zurück
+    server = FakeSMTPServer(perm_failure_rate=0.3, deterministic=True)
+    server.start()
+    try:
+        (success_count, failure_count), results, outcomes = send(
+            server, 'threads', recipients_per_transaction=10
+        )
+    finally:
+        server.stop()
+    assert set(results.values()) == {1}
+    assert failure_count == server.stats['perm_failures']
+    assert success_count == server.stats['recipients']
+
+
+@pytest.mark.parametrize('engine', ['threads', 'asyncio'])
+def test_relay_outage_leaves_undelivered_recipients_unreported(engine):
+    server = FakeSMTPServer()
+    server.start()
+    stopper = threading.Thread(target=server.stop)
+
+    def after_result(reported):
+        # Das Relay fällt nach der Hälfte der Empfänger aus
+        if reported == len(RECIPIENTS) // 2:
+            stopper.start()
+
+    results = collections.Counter()
+    outcomes = {}
+    started = time.monotonic()
+    try:
+        with pytest.raises(SMTPConnectionFailed):
+            send(server, engine, recipients_per_transaction=1, after_result=after_result,
+                 results=results, outcomes=outcomes)
+    finally:
+        stopper.join()
+    # Früher wartete jeder restliche Auftrag 0,5 s auf einen Platz in der Warteschlange
+    assert time.monotonic() - started < 10
+    assert set(results.values()) == {1}
+    # Nur zugestellte Empfänger werden gemeldet; die übrigen bleiben für die Fortsetzung offen
+    assert len(results) < len(RECIPIENTS)
+    assert all(outcomes.values())
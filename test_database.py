@@ -0,0 +1,87 @@
+# test_database.py
+import sqlite3
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'marketing_tool.db')
+    database.close_db()
+    monkeypatch.setattr(database, 'DB_FILE', path)
+    yield path
+    database.close_db()
+
+
+def create_baseline_db(path, emails):
+    # Schema der ersten Version: nur die Tabelle emails, UNIQUE unterscheidet Groß-/Kleinschreibung
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE emails (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL
+        )
+    ''')
+    conn.executemany('INSERT INTO emails (email) VALUES (?)', [(email,) for email in emails])
+    conn.commit()
+    conn.close()
+
+
+def rows(sql, params=()):
+    with database._transaction() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def test_migrations_merge_case_duplicates(db_file):
+    create_baseline_db(db_file, [
+        'MÜLLER@x.de', 'müller@x.de', 'Foo@Example.com', 'foo@example.com', ' foo@EXAMPLE.com', 'bar@example.com',
+    ])
+
+    database.init_db()
+
+    assert rows('PRAGMA user_version') == [(len(database.MIGRATIONS),)]
+    # Die älteste Schreibweise bleibt erhalten
+    assert rows('SELECT id, email, email_norm, domain FROM emails ORDER BY id') == [
+        (1, 'MÜLLER@x.de', 'müller@x.de', 'x.de'),
+        (3, 'Foo@Example.com', 'foo@example.com', 'example.com'),
+        (6, 'bar@example.com', 'bar@example.com', 'example.com'),
+    ]
+    assert database.add_email('müller@X.DE') is None
+    assert database.delete_emails(['MÜLLER@x.de']) == [(1, 'MÜLLER@x.de')]
+    assert rows('SELECT email FROM emails ORDER BY id') == [('Foo@Example.com',), ('bar@example.com',)]
+
+
+def test_migration_repairs_ascii_only_normalization(db_file):
+    # Stand nach der früheren Migration 3, die email_norm mit lower() von SQLite füllte
+    create_baseline_db(db_file, ['MÜLLER@x.de', 'müller@x.de'])
+    migrations = database.MIGRATIONS
+    database.MIGRATIONS = migrations[:2]
+    try:
+        database.init_db()
+    finally:
+        database.MIGRATIONS = migrations
+    with database._transaction() as cursor:
+        cursor.execute('ALTER TABLE emails ADD COLUMN email_norm TEXT')
+        cursor.execute('UPDATE emails SET email_norm = lower(trim(email))')
+        cursor.execute('CREATE UNIQUE INDEX idx_emails_email_norm ON emails (email_norm)')
+        cursor.execute("INSERT INTO segments (name) VALUES ('Newsletter')")
+        cursor.execute('INSERT INTO email_segments (segment_id, email_id) VALUES (1, 2)')
+        cursor.execute("UPDATE emails SET status = 'unsubscribed' WHERE id = 2")
+        cursor.execute('PRAGMA user_version = 3')
+
+    database.migrate_db()
+
+    # Die Abmeldung und das Segment des Duplikats gehen auf die verbleibende Zeile über
+    assert rows('SELECT id, email_norm, status FROM emails') == [(1, 'müller@x.de', 'unsubscribed')]
+    assert rows('SELECT segment_id, email_id FROM email_segments') == [(1, 1)]
+    assert rows('PRAGMA user_version') == [(len(database.MIGRATIONS),)]
+
+
+def test_migrations_on_current_schema_are_idempotent(db_file):
+    database.init_db()
+    database.add_emails(['a@example.com', 'A@example.com', 'b@example.com'])
+    database.migrate_db()
+    assert rows('SELECT email FROM emails ORDER BY id') == [('a@example.com',), ('b@example.com',)]
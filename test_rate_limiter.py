@@ -0,0 +1,48 @@
+# test_rate_limiter.py
+import threading
+
+from email_manager import RateLimiter
+
+
+def test_concurrent_throttle_reports_count_once():
+    # Acht Verbindungen sehen dieselbe Drosselung gleichzeitig
+    limiter = RateLimiter(per_second=50)
+    barrier = threading.Barrier(8)
+
+    def report():
+        barrier.wait()
+        limiter.on_throttled()
+
+    threads = [threading.Thread(target=report) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert limiter.factor == 0.5
+    assert limiter._backoff == 1.0
+    assert limiter.reserve() <= 1.0
+
+
+def test_throttle_after_pause_lowers_rate_again():
+    clock = [1000.0]
+    limiter = RateLimiter(per_second=50, clock=lambda: clock[0])
+
+    limiter.on_throttled()
+    limiter.on_throttled()
+    assert limiter.factor == 0.5
+
+    # Nach Ablauf der Pause ist es eine neue Drosselung
+    clock[0] += 1.5
+    limiter.on_throttled()
+    assert limiter.factor == 0.25
+    assert limiter._backoff == 2.0
+
+
+def test_success_recovers_rate_gradually():
+    limiter = RateLimiter(per_second=50, recovery_step=0.1)
+    limiter.on_throttled()
+    for _ in range(5):
+        limiter.on_success()
+    assert abs(limiter.factor - 1.0) < 1e-9
+    assert limiter._backoff == 0.0